@@ -0,0 +1,173 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import exploration as ex
+from chiplet_actuary import trace
+from chiplet_actuary import utils
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+# timing.json entry of the hot path measured on the code before the trace hooks, kept by update
+BEFORE_HOOKS = 'hot_path before trace hooks'
+
+# every exploration study with the arguments of the published results
+# (single_system_RE_cost is left out, it does not run)
+STUDIES = {
+    'yield_area': ex.yield_area,
+    'cost_per_area': ex.cost_per_area,
+    'single_system_NRE': lambda: ex.single_system_NRE(4, '7', 100000),
+    'single_system_total_cost': lambda: ex.single_system_total_cost(4, '7'),
+    'AMD_cost': ex.AMD_cost,
+    'single_chiplet_multiple_systems': lambda: ex.single_chiplet_multiple_systems(5000),
+    'one_center_multiple_extensions': lambda: ex.one_center_multiple_extensions(50000),
+    'a_few_sockets_multiple_collocations': lambda: ex.a_few_sockets_multiple_collocations(500000),
+    'design_space': ex.design_space,
+    'cheapest_designs': ex.cheapest_designs,
+}
+
+
+def measure(f, repeat=5) -> float:
+    '''
+    best wall time of repeat calls of f, in seconds
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def hot_path():
+    '''
+    object model cost_RE and NRE amortization of every point of the default design space
+    '''
+    for point in ex.design_space_sweep(range(100, 1000, 100), ('5', '7', '14'), (1, 2, 4, 8),
+                                       ('OS', 'FO', 'SI'), (500000, 2000000, 10000000)).points():
+        ex.multiple_chiplets_system(**point)
+
+
+def tracing_overhead(repeat=5) -> tuple[float, float]:
+    '''
+    (seconds, seconds) of the hot path with tracing off and on, every design evaluated (the
+    design memo, bypassed while tracing, is off for both)
+    '''
+    memoize, utils.memoize_designs = utils.memoize_designs, False
+    try:
+        off = measure(hot_path, repeat)
+        with trace.tracing():
+            on = measure(hot_path, repeat)
+    finally:
+        utils.memoize_designs = memoize
+    return off, on
+
+
+def _normalize(table: pd.DataFrame) -> pd.DataFrame:
+    '''
+    the table as read back from its golden csv, so that both sides compare alike
+    '''
+    return pd.read_csv(io.StringIO(table.to_csv()), index_col=0)
+
+
+def compare(table: pd.DataFrame, golden: pd.DataFrame, rtol=1e-9) -> tuple[bool, float]:
+    '''
+    (match, max relative error) of a study output against its golden output: same shape, labels
+    and text, numbers within rtol
+    '''
+    table = _normalize(table)
+    if table.shape != golden.shape or list(table.columns) != list(golden.columns) or \
+            list(table.index) != list(golden.index):
+        return False, float('inf')
+    numeric = table.select_dtypes('number').columns
+    other = table.columns.difference(numeric, sort=False)
+    if not table[other].equals(golden[other]) or not golden[numeric].dtypes.map(
+            pd.api.types.is_numeric_dtype).all():
+        return False, float('inf')
+    a = table[numeric].to_numpy(dtype=float)
+    b = golden[numeric].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        error = np.where(a == b, 0, np.abs(a - b) / np.abs(b))
+    error = float(np.nanmax(error, initial=0))
+    return bool(np.isclose(a, b, rtol=rtol, atol=0, equal_nan=True).all()), error
+
+
+def update(studies=None, repeat=5, golden=GOLDEN):
+    '''
+    store the golden output and the timing baseline of studies (default all)
+    '''
+    os.makedirs(golden, exist_ok=True)
+    path = os.path.join(golden, 'timing.json')
+    timing = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            timing = json.load(f)
+    for name in studies or STUDIES:
+        STUDIES[name]().to_csv(os.path.join(golden, name + '.csv'))
+        timing[name] = measure(STUDIES[name], repeat)
+        print('{:40s} {:10.2f} ms'.format(name, timing[name] * 1000))
+    with open(path, 'w') as f:
+        json.dump(timing, f, indent=2)
+
+
+def check(studies=None, repeat=5, rtol=1e-9, max_slowdown: float = None, golden=GOLDEN) -> bool:
+    '''
+    run studies (default all) against their golden outputs, print the speedup over the timing
+    baseline of each one; False if an output drifts beyond rtol or (with max_slowdown) a study
+    is more than max_slowdown times slower than its baseline
+    '''
+    with open(os.path.join(golden, 'timing.json')) as f:
+        timing = json.load(f)
+    ok = True
+    print('{:40s} {:>10s} {:>10s} {:>8s} {:>10s}  {}'.format('study', 'baseline', 'now', 'speedup',
+                                                            'rel error', 'status'))
+    for name in studies or STUDIES:
+        match, error = compare(STUDIES[name](), pd.read_csv(os.path.join(golden, name + '.csv'),
+                                                            index_col=0), rtol)
+        seconds = measure(STUDIES[name], repeat)
+        speedup = timing[name] / seconds
+        status = 'ok' if match else 'DRIFT'
+        if max_slowdown is not None and 1 / speedup > max_slowdown:
+            status = 'SLOW' if match else 'DRIFT, SLOW'
+            match = False
+        ok &= match
+        print('{:40s} {:8.2f}ms {:8.2f}ms {:7.2f}x {:10.2e}  {}'.format(
+            name, timing[name] * 1000, seconds * 1000, speedup, error, status))
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='regression harness of the exploration studies')
+    parser.add_argument('command', nargs='?', default='check', choices=('check', 'update', 'trace'),
+                        help='compare the studies to their golden outputs and timing baseline '
+                        '(default), store new golden outputs and baseline, or measure the '
+                        'tracing overhead')
+    parser.add_argument('--study', action='append', choices=list(STUDIES),
+                        help='only this study (repeatable)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs, the best one is kept')
+    parser.add_argument('--rtol', type=float, default=1e-9,
+                        help='relative tolerance of the outputs (default 1e-9)')
+    parser.add_argument('--max-slowdown', type=float,
+                        help='also fail if a study is this many times slower than its baseline')
+    args = parser.parse_args(argv)
+
+    if args.command == 'update':
+        update(args.study, args.repeat)
+    elif args.command == 'check':
+        if not check(args.study, args.repeat, args.rtol, args.max_slowdown):
+            sys.exit(1)
+    else:
+        with open(os.path.join(GOLDEN, 'timing.json')) as f:
+            before = json.load(f)[BEFORE_HOOKS]
+        off, on = tracing_overhead(args.repeat)
+        print('hot path, before the hooks: {:8.1f} ms (recorded)'.format(before * 1000))
+        print('hot path, tracing off:      {:8.1f} ms ({:.2f}x)'.format(off * 1000, off / before))
+        print('hot path, tracing on:       {:8.1f} ms ({:.1f}x)'.format(on * 1000, on / off))
+
+
+if __name__ == '__main__':
+    main()
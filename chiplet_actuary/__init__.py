@@ -1 +1,5 @@
-__all__ = ['utils', 'spec', 'module', 'chip', 'package']
+__all__ = [
+    'utils', 'spec', 'module', 'chip', 'package', 'dual', 'formula', 'vector', 'sensitivity',
+    'sweep', 'store', 'scenario', 'ramp', 'cache', 'watch', 'service', 'trace', 'partition',
+    'diff'
+]
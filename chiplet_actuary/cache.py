@@ -0,0 +1,76 @@
+import chiplet_actuary.spec as spec
+import functools
+
+# Opt-in memo of the yields, die counts and costs of designs. Every entry is tagged by the
+# parameter.ini sections it depends on, so that a reload only drops the entries of the sections
+# that changed (see watch.Watcher). Any other change of the parameters (spec.apply, e.g. by
+# sensitivity.gradient) clears the whole cache.
+enabled = False
+
+_values: dict = {}
+_keys: dict[str, set] = {}
+_generation = spec.generation
+
+
+def memoized(key, sections=None):
+    '''
+    decorator of a design method, memoize its result under key(self) and the (keyword)
+    arguments while the cache is enabled; sections(self) (default self.sections()) are the
+    sections it depends on
+    '''
+    def decorator(method):
+        name = method.__qualname__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not enabled:
+                return method(self, *args, **kwargs)
+            if _generation != spec.generation:
+                clear()
+            k = (name, key(self), args, tuple(sorted(kwargs.items())))
+            try:
+                return _values[k]
+            except KeyError:
+                pass
+            value = method(self, *args, **kwargs)
+            _values[k] = value
+            for section in (sections or type(self).sections)(self):
+                _keys.setdefault(section, set()).add(k)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def clear():
+    '''
+    drop every entry
+    '''
+    global _generation
+    _values.clear()
+    _keys.clear()
+    _generation = spec.generation
+
+
+def invalidate(sections, generation: int) -> int:
+    '''
+    after the parameters of spec.generation generation were reloaded with only sections changed,
+    drop the entries depending on them and keep the others; return the number of entries dropped
+    '''
+    global _generation
+    if _generation != generation:
+        count = len(_values)
+        clear()
+        return count
+    count = 0
+    for section in sections:
+        for k in _keys.pop(section, ()):
+            if _values.pop(k, None) is not None:
+                count += 1
+    _generation = spec.generation
+    return count
+
+
+def size() -> int:
+    return len(_values)
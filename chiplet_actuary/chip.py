@@ -1,6 +1,7 @@
 from chiplet_actuary.module import Module, D2D
 import chiplet_actuary.spec as spec
-import math
+from chiplet_actuary import formula
+from chiplet_actuary import cache
 
 
 class Chip():
@@ -11,20 +12,49 @@ class Chip():
         self.area = 0
         for module, num in self.modules.items():
             self.area += module.area * num
-        self.cost_factor = spec.Chip_NRE_Cost_Factor[self.node]
-        self.fixed = spec.Chip_NRE_Cost_Fixed[self.node]
+        self._cost_factor = None
+        self._fixed = None
         self.knownNRE = 0
+        # canonical identity from the sorted module composition, independent of dict order
+        self.fingerprint = (type(self).__name__, self.name, self.node,
+                            tuple(sorted((m.fingerprint, num) for m, num in self.modules.items())))
+        self._hash = hash(self.fingerprint)
 
     def __hash__(self) -> int:
-        return hash((self.name, self.node, self.area))
+        return self._hash
 
     def __eq__(self, other: object) -> bool:
-        return isinstance(self, type(other)) and (self.name == other.name) and (
-            self.node == other.node) and (self.area == other.area)
+        return isinstance(self, type(other)) and (self.fingerprint == other.fingerprint)
 
     def __str__(self):
         return '\n'.join(['%s:%s' % item for item in self.__dict__.items()])
 
+    @property
+    def cost_factor(self):
+        '''
+        NRE cost factor, the one of the node (read at evaluation time) unless set by setFactor
+        '''
+        if self._cost_factor is None:
+            return spec.Chip_NRE_Cost_Factor[self.node]
+        return self._cost_factor
+
+    @cost_factor.setter
+    def cost_factor(self, factor):
+        self._cost_factor = factor
+
+    @property
+    def fixed(self):
+        '''
+        fixed NRE cost, the one of the node unless set
+        '''
+        if self._fixed is None:
+            return spec.Chip_NRE_Cost_Fixed[self.node]
+        return self._fixed
+
+    @fixed.setter
+    def fixed(self, fixed):
+        self._fixed = fixed
+
     def setFactor(self, factor):
         self.cost_factor = factor
 
@@ -43,22 +73,28 @@ class Chip():
         else:
             return self.area * self.cost_factor + self.fixed
 
+    def sections(self) -> tuple[str, ...]:
+        '''
+        parameter.ini sections the yield and cost of the chip depend on
+        '''
+        return (self.node, 'Manufacture')
+
+    @cache.memoized(lambda self: (self.area, self.node))
     def die_yield(self):
-        return (1 + spec.Defect_Density_Die[self.node] / 100 * self.area / spec.critical_level)**(
-            -spec.critical_level)
+        return formula.die_yield(self.area, spec.Defect_Density_Die[self.node], spec.critical_level)
 
     def N_KGD(self):
         return self.N_die_total() * self.die_yield()
 
+    @cache.memoized(lambda self: self.area, lambda self: ('Manufacture', ))
     def N_die_total(self):
-        Area_chip = self.area + 2 * spec.scribe_lane * math.sqrt(self.area) + spec.scribe_lane**2
-        N_total = math.pi * (spec.wafer_diameter / 2 - spec.edge_loss)**2 / Area_chip - math.pi * (
-            spec.wafer_diameter - 2 * spec.edge_loss) / math.sqrt(2 * Area_chip)
-        return N_total
+        return formula.N_die_total(self.area, spec.wafer_diameter, spec.scribe_lane, spec.edge_loss)
 
+    @cache.memoized(lambda self: (self.area, self.node))
     def cost_raw_die(self):
         return spec.Cost_Wafer_Die[self.node] / self.N_die_total()
 
+    @cache.memoized(lambda self: (self.area, self.node))
     def cost_KGD(self):
         return spec.Cost_Wafer_Die[self.node] / self.N_KGD()
 
@@ -81,13 +117,11 @@ class dummy(Chip):
         self.name = dummy
         self.area = area
         self.modules = {}
+        self.fingerprint = ('dummy', self.area)
+        self._hash = hash(self.fingerprint)
 
-    def __hash__(self) -> int:
-        return hash((self.name, self.area))
-
-    def __eq__(self, other: object) -> bool:
-        return isinstance(self, type(other)) and (self.name == other.name) and (self.area
-                                                                                == other.area)
+    def sections(self):
+        return ()
 
     def NRE(self):
         return 0
@@ -0,0 +1,103 @@
+from chiplet_actuary.package import Package
+from chiplet_actuary.vector import Portfolio, RE_COLUMNS, NRE_COLUMNS
+from chiplet_actuary import scenario
+from chiplet_actuary import service
+from chiplet_actuary import watch
+import chiplet_actuary.spec as spec
+import pandas as pd
+import numpy as np
+import argparse
+import json
+
+
+def NRE_sections(p: Package) -> set[str]:
+    '''
+    parameter.ini sections the amortized NRE of a package depends on
+    '''
+    sections = {'NRE', 'OS'} | set(getattr(p, 'parameter_sections', ()))
+    for c in p.chips:
+        if hasattr(c, 'node'):
+            sections.add(c.node)
+        for m in c.modules:
+            sections.add(m.node)
+    return sections
+
+
+def diff(Packages: dict[Package, int], old: str, new: str, keep_unchanged=False,
+         check=False) -> pd.DataFrame:
+    '''
+    cost deltas of a portfolio between two parameter files: one row per package and component
+    (cost_RE, amortized NRE and total) ranked by absolute delta.
+
+    Only the packages whose inputs differ are evaluated again: cost_RE of the packages depending
+    on a changed section (Package.sections) and the NRE of those depending on a changed NRE
+    section (NRE_sections), each compiled alone (Portfolio.subset) with the amortization volumes
+    of the whole portfolio. check: also evaluate the whole portfolio again and raise
+    RuntimeError if it disagrees with the selective evaluation.
+    '''
+    old_param, new_param = scenario.read(old), scenario.read(new)
+    changed = watch.changed_sections(old_param, new_param)
+    new_values = spec.derive(new_param.getfloat, spec.node_sections(new_param))
+
+    portfolio = Portfolio(Packages)
+    before = portfolio.cost(spec.derive(old_param.getfloat, spec.node_sections(old_param)))
+    after = before.copy()
+    RE = [i for i, p in enumerate(portfolio.packages) if p.sections() & changed]
+    NRE = [i for i, p in enumerate(portfolio.packages) if NRE_sections(p) & changed]
+    if RE:
+        after[RE, :len(RE_COLUMNS)] = portfolio.subset(RE).cost_RE(new_values)
+    if NRE:
+        after[NRE, len(RE_COLUMNS):] = portfolio.subset(NRE).NRE(new_values)
+    if check:
+        full = portfolio.cost(new_values)
+        if not np.allclose(after, full, rtol=1e-12, atol=0):
+            wrong = np.flatnonzero(~np.isclose(after, full, rtol=1e-12, atol=0).all(axis=-1))
+            raise RuntimeError('the selective evaluation differs from the full one for {}'.format(
+                ', '.join(portfolio.packages[i].name for i in wrong)))
+
+    columns = RE_COLUMNS + NRE_COLUMNS + ['total']
+    before = np.concatenate([before, before.sum(axis=-1, keepdims=True)], axis=-1)
+    after = np.concatenate([after, after.sum(axis=-1, keepdims=True)], axis=-1)
+    table = pd.DataFrame({
+        'package': np.repeat([p.name for p in portfolio.packages], len(columns)),
+        'component': columns * len(portfolio.packages),
+        'old': before.ravel(),
+        'new': after.ravel(),
+    })
+    table['delta'] = table['new'] - table['old']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['relative'] = table['delta'] / table['old']
+    if not keep_unchanged:
+        table = table[table['delta'] != 0]
+    order = np.argsort(-table['delta'].abs().to_numpy(), kind='stable')
+    table = table.iloc[order].reset_index(drop=True)
+    table.attrs['changed sections'] = sorted(changed)
+    table.attrs['recomputed cost_RE'] = [portfolio.packages[i].name for i in RE]
+    table.attrs['recomputed NRE'] = [portfolio.packages[i].name for i in NRE]
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='cost deltas of a portfolio between two '
+                                     'parameter files')
+    parser.add_argument('portfolio', help='portfolio description (json, see service.build)')
+    parser.add_argument('old', help='old parameter file')
+    parser.add_argument('new', help='new parameter file')
+    parser.add_argument('--out', help='csv output, default print the table')
+    parser.add_argument('--all', action='store_true', help='keep the unchanged components')
+    parser.add_argument('--check', action='store_true',
+                        help='check the deltas against a full evaluation of the new parameters')
+    args = parser.parse_args(argv)
+
+    with open(args.portfolio) as f:
+        Packages = dict(service.build(json.load(f)))
+    table = diff(Packages, args.old, args.new, args.all, args.check)
+    print('changed sections: {}'.format(', '.join(table.attrs['changed sections'])))
+    if args.out:
+        table.to_csv(args.out, index=False)
+    else:
+        print(table.to_string())
+
+
+if __name__ == '__main__':
+    main()
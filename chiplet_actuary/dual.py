@@ -0,0 +1,132 @@
+import math
+
+
+class Dual():
+    '''
+    Forward-mode dual number: a value with its partial derivatives {parameter: derivative}
+    '''
+    __slots__ = ('value', 'grad')
+
+    def __init__(self, value, grad: dict = None):
+        self.value = value
+        self.grad: dict = grad if grad is not None else {}
+
+    def __repr__(self):
+        return 'Dual({!r}, {!r})'.format(self.value, self.grad)
+
+    def __format__(self, format_spec):
+        return format(self.value, format_spec)
+
+    def __hash__(self) -> int:
+        return hash(self.value)
+
+    def __eq__(self, other: object) -> bool:
+        return self.value == _value(other)
+
+    def __ne__(self, other: object) -> bool:
+        return self.value != _value(other)
+
+    def __lt__(self, other) -> bool:
+        return self.value < _value(other)
+
+    def __le__(self, other) -> bool:
+        return self.value <= _value(other)
+
+    def __gt__(self, other) -> bool:
+        return self.value > _value(other)
+
+    def __ge__(self, other) -> bool:
+        return self.value >= _value(other)
+
+    def __neg__(self):
+        return Dual(-self.value, _scale(self.grad, -1))
+
+    def __pos__(self):
+        return self
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value + other.value, _combine(self.grad, 1, other.grad, 1))
+        return Dual(self.value + other, self.grad)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value - other.value, _combine(self.grad, 1, other.grad, -1))
+        return Dual(self.value - other, self.grad)
+
+    def __rsub__(self, other):
+        return Dual(other - self.value, _scale(self.grad, -1))
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value * other.value,
+                        _combine(self.grad, other.value, other.grad, self.value))
+        return Dual(self.value * other, _scale(self.grad, other))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.value / other.value,
+                        _combine(self.grad, 1 / other.value, other.grad,
+                                 -self.value / other.value**2))
+        return Dual(self.value / other, _scale(self.grad, 1 / other))
+
+    def __rtruediv__(self, other):
+        return Dual(other / self.value, _scale(self.grad, -other / self.value**2))
+
+    def __pow__(self, other):
+        if isinstance(other, Dual):
+            value = self.value**other.value
+            return Dual(value,
+                        _combine(self.grad, other.value * self.value**(other.value - 1),
+                                 other.grad, value * math.log(self.value)))
+        return Dual(self.value**other, _scale(self.grad, other * self.value**(other - 1)))
+
+    def __rpow__(self, other):
+        value = other**self.value
+        return Dual(value, _scale(self.grad, value * math.log(other)))
+
+    def sqrt(self):
+        value = math.sqrt(self.value)
+        return Dual(value, _scale(self.grad, 0.5 / value))
+
+    def log(self):
+        return Dual(math.log(self.value), _scale(self.grad, 1 / self.value))
+
+
+def _value(x):
+    return x.value if isinstance(x, Dual) else x
+
+
+def _scale(grad: dict, factor) -> dict:
+    return {k: d * factor for k, d in grad.items()}
+
+
+def _combine(grad_a: dict, factor_a, grad_b: dict, factor_b) -> dict:
+    grad = {k: d * factor_a for k, d in grad_a.items()}
+    for k, d in grad_b.items():
+        grad[k] = grad.get(k, 0) + d * factor_b
+    return grad
+
+
+def sqrt(x):
+    '''
+    square root of a float, a Dual or an array
+    '''
+    if isinstance(x, Dual):
+        return x.sqrt()
+    if isinstance(x, (int, float)):
+        return math.sqrt(x)
+    return x**0.5
+
+
+def log(x):
+    '''
+    natural logarithm of a float or a Dual
+    '''
+    if isinstance(x, Dual):
+        return x.log()
+    return math.log(x)
@@ -0,0 +1,21 @@
+from chiplet_actuary.dual import sqrt
+import math
+
+# Shared yield and wafer formulas, valid for floats, Duals and numpy arrays (broadcast)
+
+
+def die_yield(area, defect_density, critical_level):
+    '''
+    negative binomial yield of a die (or interposer) of area mm2, defect_density in #/cm2
+    '''
+    return (1 + defect_density / 100 * area / critical_level)**(-critical_level)
+
+
+def N_die_total(area, wafer_diameter, scribe_lane, edge_loss):
+    '''
+    number of dies of area mm2 on a wafer
+    '''
+    Area_chip = area + 2 * scribe_lane * sqrt(area) + scribe_lane**2
+    N_total = math.pi * (wafer_diameter / 2 - edge_loss)**2 / Area_chip - math.pi * (
+        wafer_diameter - 2 * edge_loss) / sqrt(2 * Area_chip)
+    return N_total
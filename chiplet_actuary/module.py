@@ -6,19 +6,34 @@ class Module():
         self.name = name
         self.node = node
         self.area = area
-        self.cost_factor = spec.Module_NRE_Cost_Factor[self.node]
+        self._cost_factor = None
         self.knownNRE = 0
+        # canonical identity, precomputed for O(1) set and dict lookups
+        self.fingerprint = (type(self).__name__, self.name, self.node, self.area)
+        self._hash = hash(self.fingerprint)
 
     def __hash__(self) -> int:
-        return hash((self.name, self.node, self.area))
+        return self._hash
 
     def __eq__(self, other: object) -> bool:
-        return isinstance(self, type(other)) and (self.name == other.name) and (
-            self.node == other.node) and (self.area == other.area)
+        return isinstance(self, type(other)) and (self.fingerprint == other.fingerprint)
 
     def __str__(self):
         return '\n'.join(['%s:%s' % item for item in self.__dict__.items()])
 
+    @property
+    def cost_factor(self):
+        '''
+        NRE cost factor, the one of the node (read at evaluation time) unless set by setFactor
+        '''
+        if self._cost_factor is None:
+            return spec.Module_NRE_Cost_Factor[self.node]
+        return self._cost_factor
+
+    @cost_factor.setter
+    def cost_factor(self, factor):
+        self._cost_factor = factor
+
     def setNRE(self, n):
         self.knownNRE = n
 
@@ -1,20 +1,36 @@
 from chiplet_actuary.chip import Chip
 from chiplet_actuary.module import Module
 import chiplet_actuary.spec as spec
-import math
+from chiplet_actuary import formula
+from chiplet_actuary import cache
+from chiplet_actuary import trace
 
 
 class Package():
     def __init__(self, name, chips: dict):
         self.name = name
-        self.chips: dict = chips
+        # a package used as a component of this one is placed as its (memoized) Subassembly
+        self.chips: dict = {(c.component() if isinstance(c, Package) else c): num
+                            for c, num in chips.items()}
+        # the footprint of a subassembly follows the parameters, the other areas are fixed
+        self._total_module_area = None
+        if not any(isinstance(c, Subassembly) for c in self.chips):
+            self._total_module_area = 0
+            for chip, num in self.chips.items():
+                self._total_module_area += chip.area * num
+        # canonical design identity (any name): package type, its parameters and sorted chips
+        self.fingerprint = (type(self).__name__, self.design_parameters(),
+                            tuple(sorted((c.fingerprint, num) for c, num in self.chips.items())))
+        self._hash = hash((self.name, self.fingerprint))
+        self._subassembly = None
+        self._components = None
 
     def __hash__(self) -> int:
-        return hash((self.name, self.area(), type(self)))
+        return self._hash
 
     def __eq__(self, other: object) -> bool:
-        return isinstance(self, type(other)) and (self.name == other.name) and (self.area()
-                                                                                == other.area())
+        return isinstance(self, type(other)) and (self.name == other.name) and (
+            self.fingerprint == other.fingerprint)
 
     def __str__(self):
         return '\n'.join(['%s:%s' % item for item in self.__dict__.items()])
@@ -25,14 +41,19 @@ class Package():
             num += n
         return num
 
+    def design_parameters(self) -> tuple:
+        '''
+        Parameters of the package type that distinguish two designs with the same chips
+        '''
+        return ()
+
     def total_module_area(self):
         '''
         Total area of all modules
         '''
-        area = 0
-        for chip, num in self.chips.items():
-            area += chip.area * num
-        return area
+        if self._total_module_area is None:
+            return sum(chip.area * num for chip, num in self.chips.items())
+        return self._total_module_area
 
     def interposer_area(self):
         '''
@@ -55,6 +76,60 @@ class Package():
         '''
         pass
 
+    def sections(self) -> set[str]:
+        '''
+        parameter.ini sections the cost of the package depends on
+        '''
+        sections = {'Manufacture', 'OS'}
+        for chip in self.chips:
+            sections.update(chip.sections())
+        return sections
+
+    def footprint(self):
+        '''
+        Area taken by the package when it is a component of another package
+        '''
+        return self.area()
+
+    def component(self):
+        '''
+        The package as a component of other packages, created once and shared by all of them
+        '''
+        if self._subassembly is None:
+            self._subassembly = Subassembly(self)
+        return self._subassembly
+
+    def components(self) -> tuple[dict[Chip, float], dict]:
+        '''
+        ({chip: count}, {package: count}) of all chips and subassembly packages included,
+        recursively through the subassemblies
+        '''
+        if self._components is None:
+            chips: dict = {}
+            packages: dict = {}
+            for chip, num in self.chips.items():
+                if isinstance(chip, Subassembly):
+                    packages[chip.package] = packages.get(chip.package, 0) + num
+                    sub_chips, sub_packages = chip.package.components()
+                    for c, n in sub_chips.items():
+                        chips[c] = chips.get(c, 0) + n * num
+                    for p, n in sub_packages.items():
+                        packages[p] = packages.get(p, 0) + n * num
+                else:
+                    chips[chip] = chips.get(chip, 0) + num
+            self._components = (chips, packages)
+        return self._components
+
+    def module_counts(self) -> dict[Module, float]:
+        '''
+        Number of every module included, recursively through the subassemblies
+        '''
+        count: dict = {}
+        for chip, num in self.chips.items():
+            for m, num2 in chip.modules.items():
+                count[m] = count.get(m, 0) + num2 * num
+        return count
+
     def module_count(self, module: Module):
         '''
         Count the total number of modules that are included
@@ -86,6 +161,13 @@ class Package():
     def cost_total_system(self):
         return self.cost_chips() + self.cost_package()
 
+    def cost_assembly(self) -> tuple[float, float]:
+        '''
+        (raw, defect) cost of the package as a component of another package
+        '''
+        cost = self.cost_RE()
+        return cost[0] + cost[2], cost[1] + cost[3] + cost[4]
+
 
 class OS(Package):
     def __init__(self, name, chips):
@@ -121,6 +203,7 @@ class OS(Package):
             factor = 1.5
         return self.area() * spec.cost_factor_os * factor
 
+    @cache.memoized(lambda self: self.fingerprint)
     def cost_RE(self):
         cost_raw_chips = 0
         cost_defect_chips = 0
@@ -132,6 +215,16 @@ class OS(Package):
                                                          1)
         cost_wasted_chips = (cost_raw_chips +
                              cost_defect_chips) * (1 / (spec.bonding_yield_os**self.chip_num()) - 1)
+        if trace.current is not None:
+            trace.current.cost_RE(self,
+                                  chip_num=self.chip_num(),
+                                  y=spec.bonding_yield_os**self.chip_num(),
+                                  area=self.area(),
+                                  cost_raw_chips=cost_raw_chips,
+                                  cost_defect_chips=cost_defect_chips,
+                                  cost_raw_package=self.cost_raw_package(),
+                                  cost_defect_package=cost_defect_package,
+                                  cost_wasted_chips=cost_wasted_chips)
         return (cost_raw_chips, cost_defect_chips, self.cost_raw_package(), cost_defect_package,
                 cost_wasted_chips)
 
@@ -145,27 +238,62 @@ class OS(Package):
         return sum(self.cost_RE())
 
 
+def _parameter(i: int) -> property:
+    '''
+    package parameter i, the value given at construction or else the spec parameter
+    parameter_names[i], read at evaluation time so that a reload applies to existing packages;
+    read-only, as the fingerprint (hash and memo key) records it
+    '''
+    def get(self):
+        value = self._parameters[i]
+        return getattr(spec, self.parameter_names[i]) if value is None else value
+
+    return property(get)
+
+
 class Advanced(Package):
+    # sections of parameter.ini the package parameters are read from
+    parameter_sections: tuple = ()
+    # spec names of (NRE_cost_factor, NRE_cost_fixed, wafer_cost, defect_density, critical_level,
+    # bonding_yield, area_scale_factor), for the parameters not given at construction
+    parameter_names: tuple = ()
+
+    NRE_cost_factor = _parameter(0)
+    NRE_cost_fixed = _parameter(1)
+    wafer_cost = _parameter(2)
+    defect_density = _parameter(3)
+    critical_level = _parameter(4)
+    bonding_yield = _parameter(5)
+    area_scale_factor = _parameter(6)
+
     def __init__(self,
                  name: str,
                  chips: dict[Chip, int],
-                 NRE_cost_factor: float,
-                 NRE_cost_fixed: float,
-                 wafer_cost: float,
-                 defect_density: float,
-                 critical_level: int,
-                 bonding_yield: float,
-                 area_scale_factor: float,
+                 NRE_cost_factor: float = None,
+                 NRE_cost_fixed: float = None,
+                 wafer_cost: float = None,
+                 defect_density: float = None,
+                 critical_level: int = None,
+                 bonding_yield: float = None,
+                 area_scale_factor: float = None,
                  chip_last=1):
+        self._parameters = [
+            NRE_cost_factor, NRE_cost_fixed, wafer_cost, defect_density, critical_level,
+            bonding_yield, area_scale_factor
+        ]
+        self._chip_last = chip_last
         super().__init__(name, chips)
-        self.NRE_cost_factor = NRE_cost_factor
-        self.NRE_cost_fixed = NRE_cost_fixed
-        self.wafer_cost = wafer_cost
-        self.defect_density = defect_density
-        self.critical_level = critical_level
-        self.bonding_yield = bonding_yield
-        self.area_scale_factor = area_scale_factor
-        self.chip_last = chip_last
+
+    @property
+    def chip_last(self):
+        return self._chip_last
+
+    def design_parameters(self) -> tuple:
+        '''
+        the given parameters, or the names of those read from spec, and chip_last
+        '''
+        return tuple(self.parameter_names[i] if value is None else value
+                     for i, value in enumerate(self._parameters)) + (self.chip_last, )
 
     def interposer_area(self):
         return self.total_module_area() * self.area_scale_factor
@@ -173,21 +301,24 @@ class Advanced(Package):
     def area(self):
         return self.interposer_area() * spec.os_area_scale_factor
 
+    def sections(self):
+        # the u-bumps ([SI] bump_cost_factor) of the chips of every advanced package
+        return super().sections() | {'SI'} | set(self.parameter_sections)
+
+    def footprint(self):
+        # placed without its own organic substrate
+        return self.interposer_area()
+
     def NRE(self):
         return self.interposer_area() * self.NRE_cost_factor + self.NRE_cost_fixed + self.area(
         ) * spec.cost_factor_os
 
     def package_yield(self):
-        return (1 + self.defect_density / 100 * self.interposer_area() / self.critical_level)**(
-            -self.critical_level)
+        return formula.die_yield(self.interposer_area(), self.defect_density, self.critical_level)
 
     def N_package_total(self):
-        area = self.interposer_area() + 2 * spec.scribe_lane * math.sqrt(
-            self.interposer_area()) + spec.scribe_lane**2
-        N_total_package = math.pi * (
-            spec.wafer_diameter / 2 - spec.edge_loss)**2 / area - math.pi * (
-                spec.wafer_diameter - 2 * spec.edge_loss) / math.sqrt(2 * area)
-        return N_total_package
+        return formula.N_die_total(self.interposer_area(), spec.wafer_diameter, spec.scribe_lane,
+                                   spec.edge_loss)
 
     def cost_interposer(self):
         return self.wafer_cost / self.N_package_total() + self.interposer_area(
@@ -199,7 +330,12 @@ class Advanced(Package):
     def cost_raw_package(self):
         return self.cost_interposer() + self.cost_substrate()
 
-    def cost_RE(self):
+    @cache.memoized(lambda self: self.fingerprint)
+    def cost_RE(self, substrate=True):
+        '''
+        substrate: False for the interposer module alone (no organic substrate nor its bonding),
+        as placed in another package
+        '''
         cost_raw_chips = 0
         cost_defect_chips = 0
         for chip, num in self.chips.items():
@@ -207,19 +343,39 @@ class Advanced(Package):
             cost_defect_chips += chip.cost_defect() * num
         y1 = self.package_yield()
         y2 = self.bonding_yield**self.chip_num()
-        y3 = spec.bonding_yield_os
+        y3 = spec.bonding_yield_os if substrate else 1
+        cost_substrate = self.cost_substrate() if substrate else 0
         if self.chip_last == 1:
             cost_defect_package = self.cost_interposer() * (1 / (y1 * y2 * y3) - 1) \
-                + self.cost_substrate() * (1 / y3 - 1)
+                + cost_substrate * (1 / y3 - 1)
             cost_wasted_chips = (cost_raw_chips + cost_defect_chips) * (1 / (y2 * y3) - 1)
 
         elif self.chip_last == 0:
             cost_defect_package = self.cost_interposer() * (1 / (y1 * y3) - 1) \
-                + self.cost_substrate() * (1 / y3 - 1)
+                + cost_substrate * (1 / y3 - 1)
             cost_wasted_chips = (cost_raw_chips + cost_defect_chips) * (1 / (y1 * y3) - 1)
 
-        return (cost_raw_chips, cost_defect_chips, self.cost_raw_package(), cost_defect_package,
-                cost_wasted_chips)
+        if trace.current is not None:
+            trace.current.cost_RE(self,
+                                  chip_num=self.chip_num(),
+                                  chip_last=self.chip_last,
+                                  interposer_area=self.interposer_area(),
+                                  N_package_total=self.N_package_total(),
+                                  y1=y1,
+                                  y2=y2,
+                                  y3=y3,
+                                  cost_raw_chips=cost_raw_chips,
+                                  cost_defect_chips=cost_defect_chips,
+                                  cost_interposer=self.cost_interposer(),
+                                  cost_substrate=cost_substrate,
+                                  cost_defect_package=cost_defect_package,
+                                  cost_wasted_chips=cost_wasted_chips)
+        return (cost_raw_chips, cost_defect_chips, self.cost_interposer() + cost_substrate,
+                cost_defect_package, cost_wasted_chips)
+
+    def cost_assembly(self):
+        cost = self.cost_RE(substrate=False)
+        return cost[0] + cost[2], cost[1] + cost[3] + cost[4]
 
     def cost_chips(self):
         return sum(self.cost_RE()[0:2])
@@ -228,18 +384,70 @@ class Advanced(Package):
         return sum(self.cost_RE()[2:5])
 
 
+class Subassembly(Chip):
+    '''
+    A package used as a component of another package, placed like a known good chip of the area
+    of its footprint. Its cost is evaluated once and memoized for all the packages including it;
+    the NRE of the package and of its chips is amortized by utils through Package.components.
+    '''
+    def __init__(self, package: Package):
+        self.package = package
+        self.name = package.name
+        self.node = ''
+        self.modules = package.module_counts()
+        self.knownNRE = 0
+        self.fingerprint = (type(self).__name__, package.name, package.fingerprint)
+        self._hash = hash(self.fingerprint)
+        self._cost = None
+        self._generation = None
+
+    @property
+    def area(self):
+        return self.package.footprint()
+
+    def sections(self):
+        return self.package.sections()
+
+    def NRE(self):
+        return 0
+
+    def cost_RE(self):
+        if self._cost is None or self._generation != spec.generation:
+            self._cost = self.package.cost_assembly()
+            self._generation = spec.generation
+        return self._cost
+
+    def die_yield(self):
+        return self.cost_raw_die() / self.cost_KGD()
+
+    def cost_raw_die(self):
+        return self.cost_RE()[0]
+
+    def cost_defect(self):
+        return self.cost_RE()[1]
+
+    def cost_KGD(self):
+        return self.cost_raw_die() + self.cost_defect()
+
+
 class FO(Advanced):
+    parameter_sections = ('FO', )
+    parameter_names = ('fo_NRE_cost_factor', 'fo_NRE_cost_fixed', 'cost_wafer_rdl',
+                       'defect_density_rdl', 'critical_level_rdl', 'bonding_yield_rdl',
+                       'rdl_area_scale_factor')
+
     def __init__(self, name, chips, chip_last=1):
-        super().__init__(name, chips, spec.fo_NRE_cost_factor, spec.fo_NRE_cost_fixed,
-                         spec.cost_wafer_rdl, spec.defect_density_rdl, spec.critical_level_rdl,
-                         spec.bonding_yield_rdl, spec.rdl_area_scale_factor, chip_last)
+        super().__init__(name, chips, chip_last=chip_last)
 
 
 class SI(Advanced):
+    parameter_sections = ('SI', '55')
+    parameter_names = ('si_NRE_cost_factor', 'si_NRE_cost_fixed', 'cost_wafer_si',
+                       'defect_density_si', 'critical_level_si', 'bonding_yield_si',
+                       'si_area_scale_factor')
+
     def __init__(self, name, chips):
-        super().__init__(name, chips, spec.si_NRE_cost_factor, spec.si_NRE_cost_fixed,
-                         spec.cost_wafer_si, spec.defect_density_si, spec.critical_level_si,
-                         spec.bonding_yield_si, spec.si_area_scale_factor, 1)
+        super().__init__(name, chips, chip_last=1)
 
 
 def SoC(name, node, modules: dict, package='OS'):
@@ -0,0 +1,195 @@
+from chiplet_actuary.module import Module, D2D
+from chiplet_actuary.chip import Chip
+from chiplet_actuary.package import Package, OS, FO, SI
+from chiplet_actuary.vector import Portfolio
+import numpy as np
+import time
+
+
+class Partitioner():
+    '''
+    Genetic search of the partition of modules into chips, and of the package type, minimizing
+    the unit cost (cost_RE and NRE amortized over volume) of one system.
+
+    A genome gives every module a chip slot out of max_chips slots of its node (modules of
+    different nodes never share a chip) followed by the package type. Chips of a multi-chip
+    system get a D2D module of d2d_ratio times their module area, a chip larger than max_area
+    (reticle) makes the design infeasible. Every chip composition is built once and memoized,
+    so is the cost of every design (whatever the slot labels), and each generation is evaluated
+    in one batch by vector.Portfolio.
+    '''
+    def __init__(self,
+                 modules: list[Module],
+                 volume: float,
+                 packagings=('OS', 'FO', 'SI'),
+                 max_chips=8,
+                 d2d_ratio=0.1,
+                 max_area=858,
+                 population=64,
+                 seed=0):
+        self.modules = list(modules)
+        self.nodes = [m.node for m in self.modules]
+        self.volume = volume
+        self.packagings = list(packagings)
+        self.max_chips = max_chips
+        self.d2d_ratio = d2d_ratio
+        self.max_area = max_area
+        self.population = population
+        self.rng = np.random.default_rng(seed)
+        self.chips: dict = {}  # (members, d2d) -> Chip
+        self.costs: dict = {}  # design key -> unit cost
+        self.stats: dict = {
+            'generations': 0,
+            'evaluations': 0,
+            'design hits': 0,
+            'chip compositions': 0,
+            'chip hits': 0,
+            'best generation': 0,
+            'seconds': 0,
+            'history': []
+        }
+
+    def chip(self, members: frozenset, d2d: bool) -> Chip:
+        '''
+        the chip made of the modules members (indices), with a D2D module if d2d
+        '''
+        key = (members, d2d)
+        if key in self.chips:
+            self.stats['chip hits'] += 1
+            return self.chips[key]
+        modules = {self.modules[i]: 1 for i in sorted(members)}
+        node = self.nodes[next(iter(members))]
+        if d2d:
+            area = sum(m.area for m in modules)
+            modules[D2D('d2d_{}'.format(node), node)] = area * self.d2d_ratio
+        c = Chip('chip_{}'.format(len(self.chips)), node, modules)
+        self.chips[key] = c
+        self.stats['chip compositions'] = len(self.chips)
+        return c
+
+    def compositions(self, genome: np.ndarray) -> list[frozenset]:
+        slots: dict = {}
+        for i, slot in enumerate(genome[:-1].tolist()):
+            slots.setdefault((self.nodes[i], slot), []).append(i)
+        return [frozenset(members) for members in slots.values()]
+
+    def key(self, genome: np.ndarray) -> tuple:
+        '''
+        canonical design of a genome, independent of the slot labels
+        '''
+        return (int(genome[-1]), frozenset(self.compositions(genome)))
+
+    def design(self, genome: np.ndarray, name='partition') -> Package:
+        compositions = self.compositions(genome)
+        chips = {self.chip(members, len(compositions) > 1): 1 for members in compositions}
+        packaging = self.packagings[genome[-1]]
+        if packaging == 'OS':
+            return OS(name, chips)
+        elif packaging == 'FO':
+            return FO(name, chips, chip_last=1)
+        elif packaging == 'SI':
+            return SI(name, chips)
+        raise ValueError('unknown packaging {}'.format(packaging))
+
+    def evaluate(self, genomes: list[np.ndarray]) -> np.ndarray:
+        '''
+        unit cost of every genome, the designs not seen before are evaluated in one batch
+        '''
+        keys = [self.key(g) for g in genomes]
+        self.stats['evaluations'] += len(keys)
+        pending: dict = {}
+        for k, g in zip(keys, genomes):
+            if k in self.costs or k in pending:
+                self.stats['design hits'] += 1
+            else:
+                pending[k] = g
+        if pending:
+            designs = [self.design(g) for g in pending.values()]
+            feasible = np.array([max(c.area for c in d.chips) <= self.max_area for d in designs])
+            total = Portfolio([(d, self.volume) for d in designs], range(len(designs))).total()
+            for k, cost in zip(pending, np.where(feasible, total, np.inf).tolist()):
+                self.costs[k] = cost
+        return np.array([self.costs[k] for k in keys])
+
+    def initial(self) -> list[np.ndarray]:
+        '''
+        one chip per node with every packaging, then random genomes
+        '''
+        genomes = []
+        for p in range(len(self.packagings)):
+            genomes.append(np.array([0] * len(self.modules) + [p]))
+        while len(genomes) < self.population:
+            genomes.append(self.random())
+        return genomes
+
+    def random(self) -> np.ndarray:
+        chips = self.rng.integers(1, self.max_chips + 1)
+        return np.append(self.rng.integers(0, chips, len(self.modules)),
+                         self.rng.integers(len(self.packagings)))
+
+    def mutate(self, genome: np.ndarray) -> np.ndarray:
+        genome = genome.copy()
+        n = len(self.modules)
+        r = self.rng.random()
+        if r < 0.1:
+            genome[-1] = self.rng.integers(len(self.packagings))
+        elif r < 0.25:  # merge two chips of a node
+            a, b = self.rng.integers(0, self.max_chips, 2)
+            genome[:n][genome[:n] == a] = b
+        elif r < 0.35:  # split a chip
+            i = self.rng.integers(n)
+            moved = (genome[:n] == genome[i]) & (self.rng.random(n) < 0.5)
+            genome[:n][moved] = self.rng.integers(self.max_chips)
+        else:  # move a few modules
+            for i in self.rng.integers(0, n, 1 + self.rng.poisson(0.5)):
+                genome[i] = self.rng.integers(self.max_chips)
+        return genome
+
+    def crossover(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        '''
+        the chips of every node (and the packaging) from one parent or the other, slot labels
+        only make sense within a parent
+        '''
+        nodes = sorted(set(self.nodes))
+        take = dict(zip(nodes, self.rng.random(len(nodes)) < 0.5))
+        mask = np.array([take[node] for node in self.nodes] + [self.rng.random() < 0.5])
+        return np.where(mask, a, b)
+
+    def select(self, genomes: list[np.ndarray], costs: np.ndarray, size=3) -> np.ndarray:
+        '''
+        tournament selection
+        '''
+        return genomes[min(self.rng.integers(0, len(genomes), size), key=lambda i: costs[i])]
+
+    def run(self, generations=1000, patience=100, time_limit=60, elite=2,
+            crossover=0.3) -> tuple[Package, float]:
+        '''
+        evolve until generations, patience generations without improvement or time_limit
+        seconds, return the best design and its unit cost (statistics in self.stats)
+        '''
+        start = time.perf_counter()
+        genomes = self.initial()
+        costs = self.evaluate(genomes)
+        best = int(np.argmin(costs))
+        best_genome, best_cost = genomes[best], costs[best]
+        for generation in range(1, generations + 1):
+            order = np.argsort(costs)
+            children = [genomes[i] for i in order[:elite]]
+            while len(children) < self.population:
+                child = self.select(genomes, costs)
+                if self.rng.random() < crossover:
+                    child = self.crossover(child, self.select(genomes, costs))
+                children.append(self.mutate(child))
+            genomes = children
+            costs = self.evaluate(genomes)
+            self.stats['generations'] = generation
+            i = int(np.argmin(costs))
+            if costs[i] < best_cost:
+                best_genome, best_cost = genomes[i], costs[i]
+                self.stats['best generation'] = generation
+            self.stats['history'].append(float(best_cost))
+            if generation - self.stats['best generation'] >= patience or \
+                    time.perf_counter() - start > time_limit:
+                break
+        self.stats['seconds'] = time.perf_counter() - start
+        return self.design(best_genome), best_cost
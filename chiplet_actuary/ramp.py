@@ -0,0 +1,82 @@
+from chiplet_actuary.package import Package
+from chiplet_actuary.vector import Portfolio
+import chiplet_actuary.spec as spec
+import numpy as np
+
+
+def learning_curve(mature, initial_factor, time_constant, months) -> np.ndarray:
+    '''
+    value of every month on an exponential learning curve, from mature * initial_factor at month 0
+    down (or up) to mature
+    '''
+    months = np.asarray(months, dtype=float)
+    return mature * (1 + (initial_factor - 1) * np.exp(-months / time_constant))
+
+
+def curves() -> dict[str, tuple[float, float, float]]:
+    '''
+    learning curve (defect density factor, wafer cost factor, time constant in months) of every
+    node, read from the optional options ramp_defect_density, ramp_wafer_cost and ramp_months of
+    the node sections of parameter.ini (default 1, 1, 6: no ramp)
+    '''
+    result = {}
+    for node in spec.nodes:
+        result[node] = (spec.param.getfloat(node, 'ramp_defect_density', fallback=1),
+                        spec.param.getfloat(node, 'ramp_wafer_cost', fallback=1),
+                        spec.param.getfloat(node, 'ramp_months', fallback=6))
+    return result
+
+
+def ramp_values(months, node_curves: dict = None) -> dict:
+    '''
+    model parameters of every month, defect density and wafer cost of each node follow its
+    learning curve (default curves()), every parameter has shape (months,)
+    '''
+    if node_curves is None:
+        node_curves = curves()
+    overrides = {}
+    for node, (defect_factor, wafer_factor, time_constant) in node_curves.items():
+        overrides[(node, 'defect_density')] = learning_curve(spec.param.getfloat(
+            node, 'defect_density'), defect_factor, time_constant, months)
+        overrides[(node, 'wafer_cost')] = learning_curve(spec.param.getfloat(node, 'wafer_cost'),
+                                                         wafer_factor, time_constant, months)
+    return spec.substitute(overrides)
+
+
+class Ramp():
+    '''
+    A portfolio sold along a monthly volume schedule {package: volume of every month} during the
+    process ramp. All months of all packages are evaluated in one broadcast pass; the NRE is
+    amortized over the lifetime volume of the schedule.
+    '''
+    def __init__(self, Packages: dict[Package, list], node_curves: dict = None, start=0):
+        self.packages: list[Package] = list(Packages.keys())
+        self.schedule = np.array([np.asarray(v, dtype=float) for v in Packages.values()])
+        self.months = start + np.arange(self.schedule.shape[1])
+        self.portfolio = Portfolio(dict(zip(self.packages, self.schedule.sum(axis=1))))
+        self.values = ramp_values(self.months, node_curves)
+
+    def die_yield(self) -> np.ndarray:
+        '''
+        (months, chips) die yield of every chip of the portfolio
+        '''
+        return self.portfolio.die_yield(self.values)
+
+    def cost_RE(self) -> np.ndarray:
+        '''
+        (months, packages, 5) unit cost_RE of every month
+        '''
+        return self.portfolio.cost_RE(self.values)
+
+    def NRE(self) -> np.ndarray:
+        '''
+        (packages, 3) unit NRE amortized over the lifetime volume
+        '''
+        return self.portfolio.NRE(self.values)
+
+    def lifetime_cost(self) -> np.ndarray:
+        '''
+        (packages,) total cost of every package over the schedule, RE of each month plus NRE
+        '''
+        RE = np.einsum('tp,pt->p', self.cost_RE().sum(axis=-1), self.schedule)
+        return RE + self.NRE().sum(axis=-1) * self.schedule.sum(axis=1)
@@ -0,0 +1,55 @@
+from chiplet_actuary.package import Package
+from chiplet_actuary.vector import Portfolio, RE_COLUMNS, NRE_COLUMNS
+import chiplet_actuary.spec as spec
+from configparser import ConfigParser
+import numpy as np
+import os
+
+COLUMNS = RE_COLUMNS + NRE_COLUMNS
+
+
+def read(path: str, base: str = None) -> ConfigParser:
+    '''
+    read a scenario file; with base, the scenario only needs the values that differ from base
+    '''
+    for p in (base, path):
+        if p is not None and not os.path.exists(p):
+            raise FileNotFoundError(p)
+    param = ConfigParser()
+    param.read([base, path] if base is not None else [path])
+    return param
+
+
+def stack(values: list[dict]) -> dict:
+    '''
+    stack the model parameters of S scenarios into arrays of shape (S,), the technology table
+    into arrays of shape (S, nodes); every scenario must define the same nodes
+    '''
+    stacked = {}
+    for name, v in values[0].items():
+        if isinstance(v, dict):
+            stacked[name] = {k: np.array([s[name][k] for s in values]) for k in v}
+        elif isinstance(v, list):
+            if any(s[name] != v for s in values):
+                raise ValueError('the scenarios define different {}'.format(name))
+            stacked[name] = v
+        else:
+            stacked[name] = np.array([s[name] for s in values])
+    return stacked
+
+
+def load(paths: list[str], base: str = None) -> dict:
+    '''
+    model parameters of S scenario files, stacked into arrays of shape (S,)
+    '''
+    params = [read(p, base) for p in paths]
+    return stack([spec.derive(param.getfloat, spec.node_sections(param)) for param in params])
+
+
+def evaluate(Packages: dict[Package, int], paths: list[str], base: str = None,
+             dtype='float64') -> np.ndarray:
+    '''
+    (S, packages, 8) array of cost_RE and amortized NRE (COLUMNS) of a portfolio under every
+    scenario; the portfolio structure is compiled once and all scenarios are broadcast in dtype
+    '''
+    return Portfolio(Packages, dtype=dtype).cost(load(paths, base))
@@ -0,0 +1,135 @@
+from chiplet_actuary.package import Package
+from chiplet_actuary.vector import Portfolio
+from chiplet_actuary.dual import Dual
+import chiplet_actuary.spec as spec
+import numpy as np
+
+
+def gradient(evaluate, parameters: list[tuple[str, str]] = None):
+    '''
+    evaluate the cost and its gradient with respect to the raw parameters in one pass
+
+    evaluate() returns a cost (a number, or a tuple / list / dict of numbers) of modules, chips and
+    packages built before or inside it: they read the parameters when evaluated.
+    parameters: (section, option) pairs of parameter.ini to differentiate, default all of them
+    return (cost, gradient), gradient mirrors cost with {(section, option): derivative} per number
+    '''
+    if parameters is None:
+        parameters = spec.options(spec.param)
+    overrides = {}
+    for section, option in parameters:
+        key = (section, spec.param.optionxform(option))
+        overrides[key] = Dual(spec.param.getfloat(section, option), {key: 1.0})
+
+    previous = spec.apply(spec.substitute(overrides))
+    try:
+        cost = evaluate()
+    finally:
+        spec.apply(previous)
+    return _values(cost), _grads(cost)
+
+
+def elasticity(cost: float, grad: dict) -> dict:
+    '''
+    relative sensitivity (d cost / cost) / (d p / p) of every parameter, sorted by magnitude
+    '''
+    e = {}
+    for (section, option), d in grad.items():
+        e[(section, option)] = d * spec.param.getfloat(section, option) / cost
+    return dict(sorted(e.items(), key=lambda item: abs(item[1]), reverse=True))
+
+
+def quasi_random(n: int, d: int, seed=None) -> np.ndarray:
+    '''
+    (n, d) low-discrepancy points in [0, 1)^d (Kronecker sequence of the generalized golden ratio),
+    randomly shifted when seed is given
+    '''
+    phi = 2.0
+    for _ in range(30):
+        phi = (1 + phi)**(1 / (d + 1))
+    alpha = (1 / phi)**np.arange(1, d + 1)
+    shift = np.full(d, 0.5) if seed is None else np.random.default_rng(seed).random(d)
+    return (shift + np.arange(1, n + 1)[:, None] * alpha) % 1
+
+
+def bounds(spread=0.2, parameters: list[tuple[str, str]] = None) -> dict:
+    '''
+    uniform ranges of +-spread around the loaded value of every parameter, yields capped at 1
+    '''
+    if parameters is None:
+        parameters = spec.options(spec.param)
+    ranges = {}
+    for section, option in parameters:
+        value = spec.param.getfloat(section, option)
+        high = value * (1 + spread)
+        if 'yield' in option.lower():
+            high = min(high, 1)
+        ranges[(section, option)] = (value * (1 - spread), high)
+    return ranges
+
+
+def saltelli(low, high, n=1024, seed=None) -> np.ndarray:
+    '''
+    (n * (d + 2), d) points of the Saltelli scheme for d parameters uniform in [low, high]:
+    A, B and, for every parameter i, A with column i taken from B
+    '''
+    low, high = np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+    d = len(low)
+    u = quasi_random(n, 2 * d, seed)
+    A = low + u[:, :d] * (high - low)
+    B = low + u[:, d:] * (high - low)
+    AB = np.repeat(A[None], d, axis=0)
+    AB[np.arange(d), :, np.arange(d)] = B.T
+    return np.concatenate([A, B, AB.reshape(d * n, d)])
+
+
+def indices(y: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    (S1, ST) first-order (Saltelli 2010) and total (Jansen) Sobol indices, of shape
+    (parameters, outputs...), from the (n * (d + 2), outputs...) model outputs y at the points
+    of saltelli; the outputs are centered first, the estimators being biased by an offset
+    '''
+    y = np.asarray(y, dtype=float)
+    d = len(y) // n - 2
+    y = y - y[:2 * n].mean(axis=0)
+    fA, fB, fAB = y[:n], y[n:2 * n], y[2 * n:].reshape((d, n) + y.shape[1:])
+    var = y[:2 * n].var(axis=0)
+    S1 = (fB * (fAB - fA)).mean(axis=1) / var
+    ST = 0.5 * ((fA - fAB)**2).mean(axis=1) / var
+    return S1, ST
+
+
+def sobol(Packages: dict[Package, int], ranges: dict, n=1024, seed=None, dtype='float64'):
+    '''
+    first-order and total Sobol indices of the total unit cost (RE and amortized NRE) of every
+    package, for parameters uniformly distributed in ranges {(section, option): (low, high)}
+
+    All n * (parameters + 2) model evaluations of the Saltelli scheme run as one batch, in dtype
+    (float32 halves its memory, see vector.Portfolio for the error bound).
+    return (S1, ST), arrays of shape (parameters, packages) in the order of ranges
+    '''
+    keys = list(ranges.keys())
+    X = saltelli([ranges[k][0] for k in keys], [ranges[k][1] for k in keys], n, seed)
+    X = X.astype(dtype)
+    values = spec.substitute({k: X[:, i] for i, k in enumerate(keys)})
+    return indices(Portfolio(Packages, dtype=dtype).total(values), n)
+
+
+def _values(cost):
+    if isinstance(cost, Dual):
+        return cost.value
+    if isinstance(cost, dict):
+        return {k: _values(v) for k, v in cost.items()}
+    if isinstance(cost, (tuple, list)):
+        return type(cost)(_values(v) for v in cost)
+    return cost
+
+
+def _grads(cost):
+    if isinstance(cost, Dual):
+        return dict(cost.grad)
+    if isinstance(cost, dict):
+        return {k: _grads(v) for k, v in cost.items()}
+    if isinstance(cost, (tuple, list)):
+        return type(cost)(_grads(v) for v in cost)
+    return {}
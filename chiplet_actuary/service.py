@@ -0,0 +1,343 @@
+from chiplet_actuary.module import Module, D2D
+from chiplet_actuary.chip import Chip
+from chiplet_actuary.package import Package, OS, FO, SI
+from chiplet_actuary.vector import Portfolio, RE_COLUMNS, NRE_COLUMNS
+import chiplet_actuary.spec as spec
+import numpy as np
+import contextlib
+import argparse
+import asyncio
+import json
+import time
+
+# a small portfolio, the default query of the load generator
+EXAMPLE = {
+    'modules': {
+        'cpu': {'node': '7', 'area': 200},
+        'io': {'node': '14', 'area': 80},
+        'd2d_7': {'node': '7', 'type': 'D2D'},
+        'd2d_14': {'node': '14', 'type': 'D2D'}
+    },
+    'chips': {
+        'soc': {'node': '7', 'modules': {'cpu': 2, 'io': 1}},
+        'cpu_chiplet': {'node': '7', 'modules': {'cpu': 1, 'd2d_7': 5}},
+        'io_chiplet': {'node': '14', 'modules': {'io': 1, 'd2d_14': 5}}
+    },
+    'packages': {
+        'monolithic': {'type': 'OS', 'chips': {'soc': 1}, 'volume': 500000},
+        'mcm': {'type': 'OS', 'chips': {'cpu_chiplet': 2, 'io_chiplet': 1}, 'volume': 500000},
+        'info': {'type': 'FO', 'chips': {'cpu_chiplet': 2, 'io_chiplet': 1}, 'volume': 200000,
+                 'chip_last': 0},
+        'interposer': {'type': 'SI', 'chips': {'cpu_chiplet': 4, 'io_chiplet': 1}, 'volume': 100000}
+    }
+}
+
+
+def build(description: dict) -> list[tuple[Package, float]]:
+    '''
+    (package, volume) of every package of a json description, raise ValueError if it is invalid:
+    {"modules": {name: {"node": "7", "area": 100, "type": "D2D" (optional), "NRE": known NRE}},
+     "chips": {name: {"node": "7", "modules": {module: num}, "NRE": known NRE}},
+     "packages": {name: {"type": "OS" | "FO" | "SI", "chips": {chip: num}, "volume": 500000,
+                         "chip_last": 1 (FO only)}}}
+    nodes must be technology nodes of the loaded parameters, areas and numbers positive
+    '''
+    try:
+        modules: dict = {}
+        for name, m in description.get('modules', {}).items():
+            if m.get('type', 'Module') == 'D2D':
+                modules[name] = D2D(name, _node(m['node']))
+            else:
+                modules[name] = Module(name, _node(m['node']), _positive(m['area'], 'area', name))
+            if 'NRE' in m:
+                modules[name].setNRE(float(m['NRE']))
+        chips: dict = {}
+        for name, c in description.get('chips', {}).items():
+            chips[name] = Chip(name, _node(c['node']), {
+                modules[k]: _positive(num, 'number of module ' + k, name)
+                for k, num in c['modules'].items()
+            })
+            if 'NRE' in c:
+                chips[name].setNRE(float(c['NRE']))
+        packages = []
+        for name, p in description['packages'].items():
+            components = {
+                chips[k]: _positive(num, 'number of chip ' + k, name)
+                for k, num in p['chips'].items()
+            }
+            if p.get('type', 'OS') == 'OS':
+                package = OS(name, components)
+            elif p['type'] == 'FO':
+                package = FO(name, components, int(p.get('chip_last', 1)))
+            elif p['type'] == 'SI':
+                package = SI(name, components)
+            else:
+                raise ValueError('unknown package type {}'.format(p['type']))
+            packages.append((package, _positive(p['volume'], 'volume', name)))
+    except KeyError as e:
+        raise ValueError('unknown or missing {}'.format(e)) from None
+    except (TypeError, AttributeError) as e:
+        raise ValueError('invalid description: {}'.format(e)) from None
+    return packages
+
+
+def _node(node) -> str:
+    if str(node) not in spec.nodes:
+        raise ValueError('unknown technology node {}'.format(node))
+    return str(node)
+
+
+def _positive(x, what: str, name: str) -> float:
+    x = float(x)
+    if not x > 0:
+        raise ValueError('{} of {} must be positive'.format(what, name))
+    return x
+
+
+def evaluate(descriptions: list[dict]) -> list:
+    '''
+    results of a batch of descriptions, evaluated in one vectorized pass (each description is
+    amortized on its own), a ValueError instead of the result of an invalid description
+    '''
+    results: list = [None] * len(descriptions)
+    items: list = []
+    groups: list[int] = []
+    for i, description in enumerate(descriptions):
+        try:
+            packages = build(description)
+        except ValueError as e:
+            results[i] = e
+            continue
+        results[i] = {'packages': {}}
+        items += packages
+        groups += [i] * len(packages)
+    if items:
+        cost = Portfolio(items, groups).cost()
+        for (p, _), g, row in zip(items, groups, cost.tolist()):
+            results[g]['packages'][p.name] = {
+                'cost_RE': dict(zip(RE_COLUMNS, row[:5])),
+                'NRE': dict(zip(NRE_COLUMNS, row[5:])),
+                'total': sum(row)
+            }
+    return results
+
+
+class Service():
+    '''
+    Cost queries served over HTTP/1.1 (keep-alive) on a TCP port or a Unix socket:
+    POST a json description (see build) to get the cost_RE and amortized NRE of its packages,
+    GET /stats for the batching statistics.
+
+    Concurrent queries are collected into micro-batches of at most max_batch queries, waiting
+    window seconds after the first one, and every batch is evaluated in one pass (evaluate).
+    lock (e.g. watch.Watcher.lock) is held while a batch is evaluated.
+    '''
+    def __init__(self, max_batch=256, window=0.001, lock=None):
+        self.max_batch = max_batch
+        self.window = window
+        self.lock = lock if lock is not None else contextlib.nullcontext()
+        self.queries = 0
+        self.batches = 0
+        self.queue: asyncio.Queue = None
+        self._batcher: asyncio.Task = None
+
+    async def query(self, description: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((description, future))
+        return await future
+
+    async def _batch(self):
+        while True:
+            batch = [await self.queue.get()]
+            await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self.queries += len(batch)
+            self.batches += 1
+            results = self._evaluate([description for description, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _evaluate(self, descriptions: list[dict]) -> list:
+        '''
+        evaluate a batch, or each query on its own if the batch fails, so that the error of one
+        query is only sent to its client
+        '''
+        try:
+            with self.lock:
+                return evaluate(descriptions)
+        except Exception:
+            if len(descriptions) == 1:
+                raise
+        results = []
+        for description in descriptions:
+            try:
+                results.append(self._evaluate([description])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            'queries': self.queries,
+            'batches': self.batches,
+            'mean batch': self.queries / self.batches if self.batches else 0
+        }
+
+    async def _respond(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats()
+        if method != 'POST':
+            return 405, {'error': 'POST a json description'}
+        try:
+            return 200, await self.query(json.loads(body))
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': '{}: {}'.format(type(e).__name__, e)}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await reader.readline()
+                if not request.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                method, path = request.decode('latin-1').split()[:2]
+                status, result = await self._respond(method, path, body)
+                data = json.dumps(result).encode()
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: %d\r\n\r\n' %
+                             (status, _REASONS[status], len(data)) + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8000, path: str = None) -> asyncio.Server:
+        '''
+        start serving on host:port, or on the Unix socket path
+        '''
+        self.queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch())
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle, path)
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def serve(self, host='127.0.0.1', port=8000, path: str = None):
+        server = await self.start(host, port, path)
+        async with server:
+            await server.serve_forever()
+
+
+_REASONS = {200: b'OK', 400: b'Bad Request', 405: b'Method Not Allowed',
+            500: b'Internal Server Error'}
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def load(description: dict = None, requests=2000, concurrency=64, host='127.0.0.1',
+               port=8000, path: str = None) -> dict:
+    '''
+    load generator: send requests queries (default EXAMPLE) over concurrency keep-alive
+    connections, return the throughput (queries/s) and the latency percentiles (ms)
+    '''
+    body = json.dumps(EXAMPLE if description is None else description).encode()
+    message = b'POST / HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n' \
+        b'Content-Length: %d\r\n\r\n' % len(body) + body
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        for _ in pending:
+            start = time.perf_counter()
+            writer.write(message)
+            await writer.drain()
+            status, _ = await _read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    latency = np.array(latencies) * 1000
+    return {
+        'queries': requests,
+        'errors': errors,
+        'concurrency': concurrency,
+        'seconds': seconds,
+        'throughput': requests / seconds,
+        'latency ms': {
+            'mean': latency.mean(),
+            'p50': np.percentile(latency, 50),
+            'p90': np.percentile(latency, 90),
+            'p99': np.percentile(latency, 99),
+            'max': latency.max()
+        }
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='cost query service and its load generator')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='serve cost queries')
+    load_parser = commands.add_parser('load', help='measure a running service')
+    for p in (serve_parser, load_parser):
+        p.add_argument('--host', default='127.0.0.1')
+        p.add_argument('--port', type=int, default=8000)
+        p.add_argument('--unix', help='Unix socket path, instead of host:port')
+    serve_parser.add_argument('--batch', type=int, default=256, help='max queries per batch')
+    serve_parser.add_argument('--window', type=float, default=0.001,
+                              help='seconds to collect a batch')
+    load_parser.add_argument('--description', help='query (json), default a small portfolio')
+    load_parser.add_argument('--requests', type=int, default=2000)
+    load_parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        asyncio.run(Service(args.batch, args.window).serve(args.host, args.port, args.unix))
+    else:
+        description = None
+        if args.description:
+            with open(args.description) as f:
+                description = json.load(f)
+        report = asyncio.run(
+            load(description, args.requests, args.concurrency, args.host, args.port, args.unix))
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
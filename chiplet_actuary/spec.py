@@ -1,71 +1,179 @@
 from configparser import ConfigParser
+import numpy as np
 
 parameter_path = "parameter.ini"
 
-param = ConfigParser()
-param.read(parameter_path)
+# sections of parameter.ini that are not technology nodes, every other section is a node
+SECTIONS = ('NRE', 'Manufacture', 'OS', 'FO', 'SI')
+
+# per-node parameters gathered in the technology table
+NODE_PARAMETERS = ('Cost_NRE', 'Module_NRE_Cost_Factor', 'Chip_NRE_Cost_Factor',
+                   'Chip_NRE_Cost_Fixed', 'Defect_Density_Die', 'Cost_Wafer_Die')
 
-__nodes = ['3', '5', '7', '10', '14', '20', '28', '40', '55']
+# incremented by every apply, values memoized under an older generation may be stale
+generation = 0
 
-NRE_scale_factor_module = param.getfloat('NRE', 'module')
-NRE_scale_factor_chip = param.getfloat('NRE', 'chip')
 
-Cost_NRE: dict = {}
-for node in __nodes:
-    Cost_NRE[node] = param.getfloat(node, 'NRE')
+def read(path=parameter_path) -> ConfigParser:
+    '''
+    read the raw parameter set from an ini file
+    '''
+    param = ConfigParser()
+    param.read(path)
+    return param
 
-Module_NRE_Cost_Factor: dict = {}
-for node in __nodes:
-    Module_NRE_Cost_Factor[node] = NRE_scale_factor_module * Cost_NRE[node] / 300
 
-Chip_NRE_Cost_Factor: dict = {}
-for node in __nodes:
-    Chip_NRE_Cost_Factor[node] = NRE_scale_factor_chip * Cost_NRE[node] / 300
+def node_sections(param: ConfigParser) -> list[str]:
+    '''
+    the technology nodes of a parameter set, in file order
+    '''
+    return [section for section in param.sections() if section not in SECTIONS]
 
-Chip_NRE_Cost_Fixed: dict = {}
-for node in __nodes:
-    Chip_NRE_Cost_Fixed[node] = (1 - NRE_scale_factor_module -
-                                 NRE_scale_factor_chip) * Cost_NRE[node]
 
-os_NRE_cost_factor = param.getfloat('OS', 'NRE_cost_factor')
-os_NRE_cost_fixed = param.getfloat('OS', 'NRE_cost_fixed')
+def index(names, nodes: list[str] = None) -> np.ndarray:
+    '''
+    indices of node names into the technology table of nodes (default the loaded nodes)
+    '''
+    if nodes is None:
+        nodes = globals()['nodes']
+    position = {node: i for i, node in enumerate(nodes)}
+    try:
+        return np.array([position[name] for name in names], dtype=int)
+    except KeyError as e:
+        raise KeyError('unknown technology node {}'.format(e)) from None
+
+
+def table(values: dict, nodes: list[str]) -> np.ndarray:
+    '''
+    (batch..., nodes) array of a per-node parameter
+    '''
+    return np.stack(np.broadcast_arrays(*[np.asarray(values[node]) for node in nodes]), axis=-1)
+
+
+def derive(getfloat, nodes: list[str] = None) -> dict:
+    '''
+    compute all model parameters, getfloat(section, option) supplies each raw value of the
+    technology nodes (default the loaded nodes) and of the other sections
+    '''
+    if nodes is None:
+        nodes = globals()['nodes']
+    nodes = list(nodes)
+    NRE_scale_factor_module = getfloat('NRE', 'module')
+    NRE_scale_factor_chip = getfloat('NRE', 'chip')
+
+    Cost_NRE: dict = {}
+    for node in nodes:
+        Cost_NRE[node] = getfloat(node, 'NRE')
 
-fo_NRE_cost_factor = 0.5 * param.getfloat('FO', 'NRE') / 300
-fo_NRE_cost_fixed = 0.5 * param.getfloat('FO', 'NRE') / 300
+    Module_NRE_Cost_Factor: dict = {}
+    for node in nodes:
+        Module_NRE_Cost_Factor[node] = NRE_scale_factor_module * Cost_NRE[node] / 300
+
+    Chip_NRE_Cost_Factor: dict = {}
+    for node in nodes:
+        Chip_NRE_Cost_Factor[node] = NRE_scale_factor_chip * Cost_NRE[node] / 300
+
+    Chip_NRE_Cost_Fixed: dict = {}
+    for node in nodes:
+        Chip_NRE_Cost_Fixed[node] = (1 - NRE_scale_factor_module -
+                                     NRE_scale_factor_chip) * Cost_NRE[node]
+
+    os_NRE_cost_factor = getfloat('OS', 'NRE_cost_factor')
+    os_NRE_cost_fixed = getfloat('OS', 'NRE_cost_fixed')
+
+    fo_NRE_cost_factor = 0.5 * getfloat('FO', 'NRE') / 300
+    fo_NRE_cost_fixed = 0.5 * getfloat('FO', 'NRE') / 300
+
+    si_NRE_cost_factor = Chip_NRE_Cost_Factor['55'] * 1.2
+    si_NRE_cost_fixed = Chip_NRE_Cost_Fixed['55'] * 1.2
+
+    wafer_diameter = getfloat('Manufacture', 'wafer_diameter')
+    scribe_lane = getfloat('Manufacture', 'scribe_lane')
+    edge_loss = getfloat('Manufacture', 'edge_loss')
+    critical_level = getfloat('Manufacture', 'critical_level')
+
+    Defect_Density_Die: dict = {}
+    for node in nodes:
+        Defect_Density_Die[node] = getfloat(node, 'defect_density')
+
+    defect_density_rdl = getfloat('FO', 'defect_density')
+    defect_density_si = getfloat('SI', 'defect_density')
+
+    Cost_Wafer_Die = {}
+    for node in nodes:
+        Cost_Wafer_Die[node] = getfloat(node, 'wafer_cost')
+
+    cost_factor_os = getfloat('OS', 'RE_cost_factor')
+    cost_wafer_rdl = getfloat('FO', 'wafer_cost')
+    cost_wafer_si = Cost_Wafer_Die['55']
+
+    c4_bump_cost_factor = getfloat('OS', 'bump_cost_factor')
+    u_bump_cost_factor = getfloat('SI', 'bump_cost_factor')
+
+    os_area_scale_factor = getfloat('OS', 'area_scale_factor')
+    rdl_area_scale_factor = getfloat('FO', 'area_scale_factor')
+    si_area_scale_factor = getfloat('SI', 'area_scale_factor')
+
+    critical_level_rdl = getfloat('FO', 'critical_level')
+    critical_level_si = getfloat('SI', 'critical_level')
+
+    bonding_yield_os = getfloat('OS', 'bonding_yield')
+    bonding_yield_rdl = getfloat('FO', 'bonding_yield')
+    bonding_yield_si = getfloat('SI', 'bonding_yield')
+
+    # technology table: one array (batch..., nodes) per per-node parameter, indexed by index()
+    values = dict(locals())
+    values['Technology'] = {name: table(values[name], nodes) for name in NODE_PARAMETERS}
+    del values['getfloat'], values['node']
+    return values
+
+
+def options(param: ConfigParser) -> list[tuple[str, str]]:
+    '''
+    return every raw (section, option) pair of a parameter set
+    '''
+    return [(section, option) for section in param.sections()
+            for option in param.options(section)]
+
+
+def substitute(overrides: dict, param: ConfigParser = None) -> dict:
+    '''
+    derive the model parameters with some raw values replaced, overrides: {(section, option): value}
+    '''
+    if param is None:
+        param = globals()['param']
+    overrides = {(section, param.optionxform(option)): value
+                 for (section, option), value in overrides.items()}
+
+    def getfloat(section, option):
+        key = (section, param.optionxform(option))
+        if key in overrides:
+            return overrides[key]
+        return param.getfloat(section, option)
+
+    return derive(getfloat, node_sections(param))
+
+
+def apply(values: dict) -> dict:
+    '''
+    replace the model parameters with values, return the replaced ones
+    '''
+    global generation
+    previous = {name: globals().get(name) for name in values}
+    globals().update(values)
+    generation += 1
+    return previous
 
-si_NRE_cost_factor = Chip_NRE_Cost_Factor['55'] * 1.2
-si_NRE_cost_fixed = Chip_NRE_Cost_Fixed['55'] * 1.2
 
-wafer_diameter = param.getfloat('Manufacture', 'wafer_diameter')
-scribe_lane = param.getfloat('Manufacture', 'scribe_lane')
-edge_loss = param.getfloat('Manufacture', 'edge_loss')
-critical_level = param.getfloat('Manufacture', 'critical_level')
+def load(path=parameter_path):
+    '''
+    (re)load the model parameters from an ini file
+    '''
+    global param
+    param = read(path)
+    apply(derive(param.getfloat, node_sections(param)))
 
-Defect_Density_Die: dict = {}
-for node in __nodes:
-    Defect_Density_Die[node] = param.getfloat(node, 'defect_density')
-
-defect_density_rdl = param.getfloat('FO', 'defect_density')
-defect_density_si = param.getfloat('SI', 'defect_density')
-
-Cost_Wafer_Die = {}
-for node in __nodes:
-    Cost_Wafer_Die[node] = param.getfloat(node, 'wafer_cost')
-
-cost_factor_os = param.getfloat('OS', 'RE_cost_factor')
-cost_wafer_rdl = param.getfloat('FO', 'wafer_cost')
-cost_wafer_si = Cost_Wafer_Die['55']
-
-c4_bump_cost_factor = param.getfloat('OS', 'bump_cost_factor')
-u_bump_cost_factor = param.getfloat('SI', 'bump_cost_factor')
-
-os_area_scale_factor = param.getfloat('OS', 'area_scale_factor')
-rdl_area_scale_factor = param.getfloat('FO', 'area_scale_factor')
-si_area_scale_factor = param.getfloat('SI', 'area_scale_factor')
-
-critical_level_rdl = param.getfloat('FO', 'critical_level')
-critical_level_si = param.getfloat('SI', 'critical_level')
-
-bonding_yield_os = param.getfloat('OS', 'bonding_yield')
-bonding_yield_rdl = param.getfloat('FO', 'bonding_yield')
-bonding_yield_si = param.getfloat('SI', 'bonding_yield')
+
+param: ConfigParser
+nodes: list[str]
+load()
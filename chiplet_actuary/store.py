@@ -0,0 +1,114 @@
+from chiplet_actuary.sweep import Sweep
+import numpy as np
+import json
+import os
+
+
+class ResultStore():
+    '''
+    Fixed-schema binary result table backed by numpy.memmap.
+
+    Every column is stored contiguously (column-major), so a column is a zero-copy view of the
+    file and the row index is the design id. The schema (columns, rows, dtype) is kept in a json
+    sidecar next to the data file. Processes may open the same store with mode 'r+' and write
+    disjoint row ranges in parallel. A float32 store is half the size of a float64 one, costs
+    keep about 7 significant digits (see vector.Portfolio for the error bound of a float32
+    evaluation).
+    '''
+    def __init__(self, path: str, mode='r'):
+        with open(path + '.json') as f:
+            schema = json.load(f)
+        self.path = path
+        self.columns: list[str] = schema['columns']
+        self.rows: int = schema['rows']
+        self.dtype = np.dtype(schema['dtype'])
+        self.data = np.memmap(path, self.dtype, mode, shape=(len(self.columns), self.rows))
+
+    @classmethod
+    def create(cls, path: str, columns: list[str], rows: int, dtype='float64'):
+        '''
+        allocate a store of rows rows (filled with zeros) and open it for writing
+        '''
+        schema = {'columns': list(columns), 'rows': rows, 'dtype': np.dtype(dtype).str}
+        tmp = path + '.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(schema, f)
+        with open(path, 'wb') as f:
+            f.truncate(len(columns) * rows * np.dtype(dtype).itemsize)
+        os.replace(tmp, path + '.json')
+        return cls(path, 'r+')
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __str__(self):
+        return '{}: {} rows x {} ({})'.format(self.path, self.rows, self.columns, self.dtype)
+
+    def column(self, name: str) -> np.memmap:
+        '''
+        zero-copy view of a whole column
+        '''
+        return self.data[self.columns.index(name)]
+
+    def write(self, start: int, values):
+        '''
+        write rows [start, start + len(values)), values: (rows, columns) array
+        '''
+        values = np.asarray(values, dtype=self.dtype)
+        self.data[:, start:start + len(values)] = values.T
+
+    def flush(self):
+        self.data.flush()
+
+    def top_k(self, name: str, k: int, largest=False, chunk=1 << 22):
+        '''
+        (design ids, values) of the k smallest (or largest) values of a column, streaming the
+        column chunk by chunk
+        '''
+        column = self.column(name)
+        sign = -1 if largest else 1
+        best_ids = np.zeros(0, dtype=np.int64)
+        best = np.zeros(0, dtype=self.dtype)
+        for start in range(0, self.rows, chunk):
+            values = np.asarray(column[start:start + chunk]) * sign
+            if len(values) > k:
+                ids = np.argpartition(values, k)[:k]
+            else:
+                ids = np.arange(len(values))
+            best_ids = np.concatenate([best_ids, ids + start])
+            best = np.concatenate([best, values[ids]])
+            if len(best) > k:
+                keep = np.argpartition(best, k)[:k]
+                best_ids, best = best_ids[keep], best[keep]
+        order = np.lexsort((best_ids, best))
+        return best_ids[order], best[order] * sign
+
+    def histogram(self, name: str, bins=100, range=None, chunk=1 << 22):
+        '''
+        (counts, bin edges) of a column, streaming the column chunk by chunk
+        '''
+        column = self.column(name)
+        if range is None:
+            low, high = np.inf, -np.inf
+            for start in np.arange(0, self.rows, chunk):
+                values = column[start:start + chunk]
+                low, high = min(low, values.min()), max(high, values.max())
+            range = (low, high)
+        counts = np.zeros(bins, dtype=np.int64)
+        edges = np.histogram_bin_edges(np.zeros(0), bins, range)
+        for start in np.arange(0, self.rows, chunk):
+            counts += np.histogram(column[start:start + chunk], edges)[0]
+        return counts, edges
+
+
+def write_sweep(store: ResultStore, sweep: Sweep, evaluate, chunks=None):
+    '''
+    evaluate chunks of a sweep (default all) into the store, the design id of a point is its index
+    in the sweep; evaluate(**point) returns one value per store column
+    '''
+    if chunks is None:
+        chunks = range(sweep.chunk_num())
+    for k in chunks:
+        rows = [list(evaluate(**point)) for point in sweep.chunk(k)]
+        store.write(k * sweep.chunk_size, rows)
+    store.flush()
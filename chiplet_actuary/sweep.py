@@ -0,0 +1,349 @@
+from multiprocessing import Pool
+from functools import partial
+import itertools
+import argparse
+import heapq
+import importlib
+import csv
+import json
+import math
+import os
+import sys
+
+
+class Sweep():
+    '''
+    A design space grid: the cartesian product of named axes, visited in a fixed order (last axis
+    fastest) and split into chunks of consecutive points
+    '''
+    def __init__(self, axes: dict[str, list], chunk_size=64):
+        self.axes: dict = {name: list(values) for name, values in axes.items()}
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return math.prod(len(values) for values in self.axes.values())
+
+    def __str__(self):
+        return '\n'.join(['%s:%s' % item for item in self.__dict__.items()])
+
+    def chunk_num(self) -> int:
+        return math.ceil(len(self) / self.chunk_size)
+
+    def point(self, index: int) -> dict:
+        '''
+        the grid point at index
+        '''
+        point = {}
+        for name, values in reversed(self.axes.items()):
+            index, i = divmod(index, len(values))
+            point[name] = values[i]
+        return dict(reversed(point.items()))
+
+    def chunk(self, k: int) -> list[dict]:
+        '''
+        the grid points of chunk k
+        '''
+        start = k * self.chunk_size
+        return [self.point(i) for i in range(start, min(start + self.chunk_size, len(self)))]
+
+    def shard(self, i: int, n: int) -> range:
+        '''
+        chunks of shard i out of n (0 <= i < n), assigned round robin by chunk index
+        '''
+        if not 0 <= i < n:
+            raise ValueError('shard {}/{} out of range'.format(i, n))
+        return range(i, self.chunk_num(), n)
+
+    def points(self):
+        for values in itertools.product(*self.axes.values()):
+            yield dict(zip(self.axes.keys(), values))
+
+    def header(self) -> dict:
+        '''
+        description of the grid, used to refuse resuming a checkpoint of another sweep
+        '''
+        return json.loads(json.dumps({'axes': self.axes, 'chunk_size': self.chunk_size}))
+
+
+def evaluate_chunk(evaluate, points: list[dict]) -> list[list]:
+    '''
+    rows (point values followed by results) of a chunk, evaluate(**point) returns the results
+    '''
+    return [list(point.values()) + list(evaluate(**point)) for point in points]
+
+
+def _evaluate_chunk(args):
+    evaluate, k, points = args
+    return k, evaluate_chunk(evaluate, points)
+
+
+class TopK():
+    '''
+    The k cheapest items seen so far, kept in a bounded heap (O(k) memory).
+    key(item) is the cost to rank by; ties go to the item pushed with the lower index.
+    '''
+    def __init__(self, k: int, key=None):
+        self.k = k
+        self.key = key
+        self.heap: list = []  # (-cost, -index, item), the root is the most expensive item kept
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, item, index: int = None):
+        if index is None:
+            index = self.count
+        self.count += 1
+        cost = item if self.key is None else self.key(item)
+        entry = (-cost, -index, item)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+
+    def extend(self, items):
+        for item in items:
+            self.push(item)
+
+    def merge(self, other):
+        '''
+        merge the items kept by another TopK (e.g. of a parallel worker)
+        '''
+        for cost, index, item in other.heap:
+            entry = (cost, index, item)
+            if len(self.heap) < self.k:
+                heapq.heappush(self.heap, entry)
+            elif entry[:2] > self.heap[0][:2]:
+                heapq.heapreplace(self.heap, entry)
+        self.count += other.count
+        return self
+
+    def result(self) -> list:
+        '''
+        the items kept, cheapest first
+        '''
+        return [item for _, _, item in sorted(self.heap, reverse=True)]
+
+
+def result_cost(start: int, column, row: list) -> float:
+    '''
+    cost of a sweep row: result column (counted from the first result), or the sum of the results
+    '''
+    if column is None:
+        return sum(row[start:])
+    return row[start + column]
+
+
+def _top_k_shard(args):
+    sweep, evaluate, k, key, i, n = args
+    best = TopK(k, key)
+    for c in sweep.shard(i, n):
+        for j, point in enumerate(sweep.chunk(c), c * sweep.chunk_size):
+            best.push(list(point.values()) + list(evaluate(**point)), j)
+    return best
+
+
+def top_k(sweep: Sweep, evaluate, k: int, column: int = None, jobs=1) -> list[list]:
+    '''
+    the k cheapest rows of a sweep by total cost (sum of the results) or by one result column,
+    without keeping the other rows; each of the jobs workers keeps its own heap, merged at the end
+    '''
+    key = partial(result_cost, len(sweep.axes), column)
+    tasks = [(sweep, evaluate, k, key, i, jobs) for i in range(jobs)]
+    if jobs > 1:
+        with Pool(jobs) as pool:
+            heaps = pool.map(_top_k_shard, tasks)
+    else:
+        heaps = list(map(_top_k_shard, tasks))
+    best = TopK(k, key)
+    for h in heaps:
+        best.merge(h)
+    return best.result()
+
+
+def load_checkpoint(path: str, header: dict, repair=True) -> dict[int, list]:
+    '''
+    completed chunks {chunk: rows} recorded in a checkpoint file, a torn last record is dropped
+    (and cut from the file if repair)
+    '''
+    done: dict = {}
+    if not os.path.exists(path):
+        return done
+    good = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line) if line.endswith(b'\n') else None
+            except ValueError:
+                record = None
+            if record is None:
+                break
+            if good == 0 and record != header:
+                raise ValueError('checkpoint {} belongs to another sweep'.format(path))
+            if 'chunk' in record:
+                done[record['chunk']] = record['rows']
+            good += len(line)
+    if repair and good < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(good)
+    return done
+
+
+def _append(f, line: str):
+    f.write(line + '\n')
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def run(sweep: Sweep, evaluate, checkpoint: str = None, jobs=1, chunks=None,
+        shard: tuple[int, int] = None) -> list[list]:
+    '''
+    evaluate every point of the sweep and return the rows in grid order
+
+    evaluate(**point) returns a sequence of results, it must be picklable when jobs > 1.
+    checkpoint: file recording each completed chunk, chunks found there are not evaluated again.
+    chunks: indices of the chunks to evaluate, default all of them
+    shard: (i, n), evaluate only the chunks of shard i out of n and record it in the checkpoint
+    '''
+    header = sweep.header()
+    if shard is not None:
+        chunks = sweep.shard(*shard)
+        header['shard'] = list(shard)
+    if chunks is None:
+        chunks = range(sweep.chunk_num())
+    done = load_checkpoint(checkpoint, header) if checkpoint else {}
+    pending = [k for k in chunks if k not in done]
+
+    f = None
+    if checkpoint:
+        f = open(checkpoint, 'a')
+        if f.tell() == 0:
+            _append(f, json.dumps(header))
+    pool = Pool(jobs) if jobs > 1 else None
+    try:
+        tasks = ((evaluate, k, sweep.chunk(k)) for k in pending)
+        results = pool.imap_unordered(_evaluate_chunk, tasks) if pool else map(
+            _evaluate_chunk, tasks)
+        for k, rows in results:
+            # rows are kept exactly as recorded, so a resumed run merges to the same output
+            line = json.dumps({'chunk': k, 'rows': rows})
+            done[k] = json.loads(line)['rows']
+            if f:
+                _append(f, line)
+    finally:
+        if pool:
+            pool.terminate()
+        if f:
+            f.close()
+    return [row for k in chunks for row in done[k]]
+
+
+def write_csv(path: str, columns: list[str], rows: list[list]):
+    '''
+    write rows to a csv file atomically (a reader sees either the old or the complete new file)
+    '''
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def merge(sweep: Sweep, paths: list[str]) -> list[list]:
+    '''
+    rows of the whole sweep in grid order from the checkpoint files of its shards,
+    raise ValueError on a foreign, duplicated, missing or incomplete shard
+    '''
+    header = sweep.header()
+    shards: dict = {}
+    n = None
+    done: dict = {}
+    for path in paths:
+        with open(path, 'rb') as f:
+            first = json.loads(f.readline() or b'{}')
+        i, num = first.get('shard', (0, 1))
+        if {k: v for k, v in first.items() if k != 'shard'} != header:
+            raise ValueError('{} belongs to another sweep'.format(path))
+        if n is not None and num != n:
+            raise ValueError('{} is shard {}/{}, other shards are out of {}'.format(
+                path, i, num, n))
+        n = num
+        if i in shards:
+            raise ValueError('shard {}/{} is duplicated: {} and {}'.format(i, n, shards[i], path))
+        shards[i] = path
+        chunks = load_checkpoint(path, first, repair=False)
+        missing = [k for k in sweep.shard(i, n) if k not in chunks]
+        if missing:
+            raise ValueError('shard {}/{} in {} is incomplete, missing chunks {}'.format(
+                i, n, path, missing))
+        done.update(chunks)
+    missing = [i for i in range(n or 0) if i not in shards]
+    if n is None or missing:
+        raise ValueError('missing shards {} out of {}'.format(missing, n))
+    return [row for k in range(sweep.chunk_num()) for row in done[k]]
+
+
+def build(description: dict):
+    '''
+    (Sweep, evaluate, columns) of a sweep description: {"axes": {name: [values]},
+    "chunk_size": 64, "evaluate": "module:function", "columns": [result names]}
+    '''
+    s = Sweep(description['axes'], description.get('chunk_size', 64))
+    module_name, function = description['evaluate'].split(':')
+    evaluate = getattr(importlib.import_module(module_name), function)
+    return s, evaluate, list(s.axes) + description.get('columns', [])
+
+
+def load(path: str):
+    '''
+    read a sweep description (json, see build), return (Sweep, evaluate, columns)
+    '''
+    with open(path) as f:
+        return build(json.load(f))
+
+
+def _shard(value: str) -> tuple[int, int]:
+    '''
+    (i, n) of a --shard value i/N, 0 <= i < N
+    '''
+    try:
+        i, n = map(int, value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid shard {!r}, expected i/N'.format(value))
+    if not 0 <= i < n:
+        raise argparse.ArgumentTypeError('shard {} out of range, expected 0 <= i < N'.format(value))
+    return i, n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run a sweep shard or merge shard outputs')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='evaluate (a shard of) a sweep')
+    run_parser.add_argument('sweep', help='sweep description (json)')
+    run_parser.add_argument('--shard', type=_shard, default='0/1',
+                            help='i/N, 0 <= i < N (default 0/1)')
+    run_parser.add_argument('--jobs', type=int, default=1)
+    run_parser.add_argument('--out', required=True, help='shard output, also used to resume')
+    merge_parser = commands.add_parser('merge', help='merge shard outputs into one table')
+    merge_parser.add_argument('sweep', help='sweep description (json)')
+    merge_parser.add_argument('shards', nargs='+', help='shard outputs')
+    merge_parser.add_argument('--out', required=True, help='merged csv')
+    args = parser.parse_args(argv)
+
+    s, evaluate, columns = load(args.sweep)
+    if args.command == 'run':
+        run(s, evaluate, args.out, args.jobs, shard=args.shard)
+    else:
+        try:
+            rows = merge(s, args.shards)
+        except ValueError as e:
+            sys.exit('error: {}'.format(e))
+        write_csv(args.out, columns, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+from chiplet_actuary.chip import Chip, dummy
+import chiplet_actuary.spec as spec
+import contextlib
+
+# The Trace being recorded, None when tracing is off. The hot paths (cost_RE of the packages and
+# utils.system_total_apporitioned_NRE_cost) only test it once per package; the chip level
+# intermediates are evaluated again by the trace itself.
+current = None
+
+
+class Node():
+    '''
+    A traced quantity: its name, its intermediate values and the nodes it is made of
+    '''
+    def __init__(self, name: str, values: dict = None, children: list = None):
+        self.name = name
+        self.values: dict = values if values is not None else {}
+        self.children: list[Node] = children if children is not None else []
+
+    def __str__(self):
+        return self.format()
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'values': self.values,
+            'children': [child.to_dict() for child in self.children]
+        }
+
+    def format(self, depth=0) -> str:
+        line = '  ' * depth + self.name
+        if self.values:
+            line += ': ' + ', '.join('{}={}'.format(k, _number(v)) for k, v in self.values.items())
+        lines = [line]
+        for child in self.children:
+            lines.append(child.format(depth + 1))
+        return '\n'.join(lines)
+
+
+class Trace():
+    '''
+    Intermediates of cost_RE and of the NRE amortization, recorded as a tree per package:
+    package -> cost_RE -> chips (die yield, dies per wafer, ...) and package -> NRE -> modules,
+    chips and packages with the volume each NRE is divided by.
+    '''
+    def __init__(self):
+        self.packages: dict = {}
+
+    def __getitem__(self, package) -> Node:
+        return self.packages[package]
+
+    def __str__(self):
+        return self.format()
+
+    def node(self, package) -> Node:
+        if package not in self.packages:
+            self.packages[package] = Node('{} {}'.format(type(package).__name__, package.name))
+        return self.packages[package]
+
+    def _replace(self, package, node: Node):
+        root = self.node(package)
+        root.children = [n for n in root.children if n.name != node.name] + [node]
+
+    def cost_RE(self, package, **values):
+        '''
+        record the intermediates of package.cost_RE
+        '''
+        chips = [self.chip(c, num) for c, num in package.chips.items()]
+        self._replace(package, Node('cost_RE', values, chips))
+
+    def chip(self, chip: Chip, num) -> Node:
+        if isinstance(chip, dummy):
+            return Node('dummy', {'num': num, 'area': chip.area})
+        if hasattr(chip, 'package'):  # a subassembly, its own tree is kept if it was traced
+            children = [self.packages[chip.package]] if chip.package in self.packages else []
+            return Node('subassembly {}'.format(chip.name), {
+                'num': num,
+                'area': chip.area,
+                'cost_raw_die': chip.cost_raw_die(),
+                'cost_defect': chip.cost_defect()
+            }, children)
+        return Node(
+            'chip {}'.format(chip.name), {
+                'num': num,
+                'node': chip.node,
+                'area': chip.area,
+                'defect_density': spec.Defect_Density_Die[chip.node],
+                'die_yield': chip.die_yield(),
+                'N_die_total': chip.N_die_total(),
+                'N_KGD': chip.N_KGD(),
+                'wafer_cost': spec.Cost_Wafer_Die[chip.node],
+                'cost_raw_die': chip.cost_raw_die(),
+                'cost_defect': chip.cost_defect()
+            })
+
+    def NRE(self, package, NRE: tuple, module_volume: dict, chip_volume: dict,
+            package_volume: dict):
+        '''
+        record the amortized (module_NRE, chip_NRE, package_NRE) of package, with the total
+        volumes of utils.system_total_apporitioned_NRE_cost
+        '''
+        chips, subassemblies = package.components()
+        children = []
+        module_count: dict = {}
+        for c, num in chips.items():
+            for m, num2 in c.modules.items():
+                module_count[m] = module_count.get(m, 0) + num2 * num
+        for m, num in module_count.items():
+            children.append(_amortized('module {}'.format(m.name), m.NRE(), module_volume[m], num))
+        for c, num in chips.items():
+            children.append(_amortized('chip {}'.format(c.name), c.NRE(), chip_volume[c], num))
+        children.append(
+            _amortized('package {}'.format(package.name), package.NRE(),
+                       package_volume[package.area()], 1))
+        for p, num in subassemblies.items():
+            children.append(
+                _amortized('package {}'.format(p.name), p.NRE(), package_volume[p.area()], num))
+        values = dict(zip(('module_NRE', 'chip_NRE', 'package_NRE'), NRE))
+        self._replace(package, Node('NRE', values, children))
+
+    def format(self) -> str:
+        return '\n'.join(node.format() for node in self.packages.values())
+
+    def to_dict(self) -> list[dict]:
+        return [node.to_dict() for node in self.packages.values()]
+
+
+def _amortized(name: str, NRE, volume, num) -> Node:
+    return Node(name, {'NRE': NRE, 'volume': volume, 'num': num, 'amortized': NRE / volume * num})
+
+
+def _number(v) -> str:
+    return '{:.6g}'.format(v) if isinstance(v, float) else str(v)
+
+
+@contextlib.contextmanager
+def tracing():
+    '''
+    record a Trace of every evaluation in the block (values served by cache are not traced):
+    with trace.tracing() as t:
+        system.cost_RE()
+    print(t[system])
+    '''
+    global current
+    previous = current
+    current = Trace()
+    try:
+        yield current
+    finally:
+        current = previous
@@ -1,8 +1,16 @@
 from chiplet_actuary.package import Package, OS, FO, SI
-from chiplet_actuary.chip import Chip
+from chiplet_actuary.chip import Chip, Chiplet
 from chiplet_actuary.module import Module
+from chiplet_actuary import trace
+import chiplet_actuary.spec as spec
+import numpy as np
 import math
 
+# design_cost_RE reuses the previous design only while True (off to time every evaluation)
+memoize_designs = True
+# the last design evaluated by design_cost_RE: (spec.generation, fingerprint, cost_RE)
+_last_design = None
+
 
 def PHYarea(numberpin, pitch=0.055, depth=1) -> float:
     '''
@@ -14,10 +22,41 @@ def PHYarea(numberpin, pitch=0.055, depth=1) -> float:
     return width * depth
 
 
+def PHYareas(numberpin, pitch=0.055, depth=1) -> np.ndarray:
+    '''
+    compute PHY areas of arrays of PIN numbers and pitches (broadcast), same as PHYarea
+    '''
+    numberpin = np.asarray(numberpin, dtype=float)
+    pitch = np.asarray(pitch, dtype=float)
+    num_pad_depth = np.floor(depth / (pitch * math.sqrt(3) / 2))
+    num_pad_width = np.ceil(numberpin / num_pad_depth)
+    width = (num_pad_width + 1) * pitch
+    return width * depth
+
+
+def D2D_areas(bandwidth, pin_rate, pitch=0.055, depth=1) -> np.ndarray:
+    '''
+    compute D2D PHY areas from arrays of bandwidth (Gb/s), pin rate (Gb/s per pin) and
+    bump pitch (broadcast)
+    '''
+    numberpin = np.ceil(np.asarray(bandwidth, dtype=float) / pin_rate)
+    return PHYareas(numberpin, pitch, depth)
+
+
+def chiplets(modules: list[Module], bandwidth, pin_rate, pitch=0.055, depth=1) -> list[Chiplet]:
+    '''
+    build a Chiplet of every module, its D2D area sized by D2D_areas (arguments broadcast
+    against the modules)
+    '''
+    areas = np.broadcast_to(D2D_areas(bandwidth, pin_rate, pitch, depth), (len(modules), ))
+    return [Chiplet(m, float(area)) for m, area in zip(modules, areas)]
+
+
 def get_all_packages(Packages: set) -> set[Package]:
     package_set = set()
     for p in Packages:
         package_set.add(p)
+        package_set.update(p.components()[1])
     return package_set
 
 
@@ -27,7 +66,7 @@ def get_all_modules(Packages: set) -> set[Module]:
     '''
     module_set: set = set()
     for p in Packages:
-        for c in p.chips.keys():
+        for c in p.components()[0]:
             for m in c.modules.keys():
                 module_set.add(m)
     return module_set
@@ -39,7 +78,7 @@ def get_all_chips(Packages: set) -> set[Chip]:
     '''
     chip_set: set = set()
     for p in Packages:
-        for c in p.chips.keys():
+        for c in p.components()[0]:
             chip_set.add(c)
     return chip_set
 
@@ -100,8 +139,9 @@ def chip_amortized_unit_cost(c: Chip, Packages: dict[Package, int]) -> float:
     '''
     total_volume = 0
     for p, volume in Packages.items():
-        if c in p.chips:
-            total_volume += p.chips[c] * volume
+        chips = p.components()[0]
+        if c in chips:
+            total_volume += chips[c] * volume
     return c.NRE() / total_volume
 
 
@@ -113,6 +153,9 @@ def package_amortized_unit_cost(p: Package, Packages: dict[Package, int]) -> flo
     for pp, volume in Packages.items():
         if p.area() == pp.area():
             total_volume += volume
+        for sub, num in pp.components()[1].items():
+            if p.area() == sub.area():
+                total_volume += num * volume
     return p.NRE() / total_volume
 
 
@@ -136,7 +179,7 @@ def chip_amortized_cost(Packages: dict[Package, int]) -> dict[Package, float]:
     cost: dict = {}
     for p in Packages.keys():
         cost[p] = 0
-        for c, num in p.chips.items():
+        for c, num in p.components()[0].items():
             cost[p] += chip_amortized_unit_cost(c, Packages) * num
     return cost
 
@@ -148,26 +191,114 @@ def package_amortized_cost(Packages: dict[Package, int]) -> dict[Package, float]
     cost: dict = {}
     for p in Packages.keys():
         cost[p] = package_amortized_unit_cost(p, Packages)
+        for sub, num in p.components()[1].items():
+            cost[p] += package_amortized_unit_cost(sub, Packages) * num
     return cost
 
 
+def module_total_volume(Packages: dict[Package, int]) -> dict[Module, float]:
+    '''
+    return the total sale volume of every module (sum of p.module_count(m) * volume)
+    '''
+    total: dict = {}
+    for p, volume in Packages.items():
+        count: dict = {}
+        for c, num in p.components()[0].items():
+            for m, num2 in c.modules.items():
+                count[m] = count.get(m, 0) + num2 * num
+        for m, n in count.items():
+            total[m] = total.get(m, 0) + n * volume
+    return total
+
+
+def chip_total_volume(Packages: dict[Package, int]) -> dict[Chip, float]:
+    '''
+    return the total sale volume of every chip
+    '''
+    total: dict = {}
+    for p, volume in Packages.items():
+        for c, num in p.components()[0].items():
+            total[c] = total.get(c, 0) + num * volume
+    return total
+
+
+def package_total_volume(Packages: dict[Package, int]) -> dict[float, float]:
+    '''
+    return the total sale volume of every package design (subassemblies included), keyed by
+    package area
+    '''
+    total: dict = {}
+    for p, volume in Packages.items():
+        area = p.area()
+        total[area] = total.get(area, 0) + volume
+        for pp, num in p.components()[1].items():
+            area = pp.area()
+            total[area] = total.get(area, 0) + num * volume
+    return total
+
+
 def system_total_apporitioned_NRE_cost(Packages: dict[Package, int]) -> dict[Package, tuple[float]]:
     '''
     return the amortized total NRE cost for each package
     '''
+    module_volume = module_total_volume(Packages)
+    chip_volume = chip_total_volume(Packages)
+    package_volume = package_total_volume(Packages)
     NRE_cost: dict = {}
     for p, sale_volume in Packages.items():
-        package_NRE = package_amortized_unit_cost(p, Packages)
+        chips, subassemblies = p.components()
+        package_NRE = p.NRE() / package_volume[p.area()]
+        for pp, num in subassemblies.items():
+            package_NRE += pp.NRE() / package_volume[pp.area()] * num
         chip_NRE = 0
         module_NRE = 0
-        for c, num in p.chips.items():
-            chip_NRE += chip_amortized_unit_cost(c, Packages) * num
+        for c, num in chips.items():
+            chip_NRE += c.NRE() / chip_volume[c] * num
             for m, num2 in c.modules.items():
-                module_NRE += module_amortized_unit_cost(m, Packages) * num2 * num
+                module_NRE += m.NRE() / module_volume[m] * num2 * num
         NRE_cost[p] = (module_NRE, chip_NRE, package_NRE)
+        if trace.current is not None:
+            trace.current.NRE(p, NRE_cost[p], module_volume, chip_volume, package_volume)
     return NRE_cost
 
 
+def unique(designs) -> list:
+    '''
+    return the designs (modules, chips or packages) without those equivalent to an earlier one,
+    i.e. with the same fingerprint whatever their name or the order of their components
+    '''
+    seen: set = set()
+    result = []
+    for d in designs:
+        if d.fingerprint not in seen:
+            seen.add(d.fingerprint)
+            result.append(d)
+    return result
+
+
+def designs_cost_RE(packages) -> dict:
+    '''
+    cost_RE of every package, evaluated once per equivalent design (see unique)
+    '''
+    cost = {p.fingerprint: p.cost_RE() for p in unique(packages)}
+    return {p: cost[p.fingerprint] for p in packages}
+
+
+def design_cost_RE(system: Package) -> tuple:
+    '''
+    system.cost_RE(), reused if system is equivalent to the previous design (same fingerprint,
+    whatever its name or the order of its components) under the same parameters, e.g. for the
+    consecutive points of a sweep that only differ by volume (its last axis); only the last
+    design is kept, and it is evaluated again while tracing
+    '''
+    global _last_design
+    if trace.current is not None or not memoize_designs:
+        return system.cost_RE()
+    if _last_design is None or _last_design[:2] != (spec.generation, system.fingerprint):
+        _last_design = (spec.generation, system.fingerprint, system.cost_RE())
+    return _last_design[2]
+
+
 def info(p):
     if len(p.chips) > 1:
         system_type = "2.5D Intergration"
@@ -0,0 +1,342 @@
+from chiplet_actuary.package import Package, OS, SI, Subassembly
+from chiplet_actuary.chip import dummy
+from chiplet_actuary.module import D2D
+from chiplet_actuary import formula
+import chiplet_actuary.spec as spec
+import numpy as np
+
+RE_COLUMNS = ['raw chips', 'defect chips', 'raw package', 'defect package', 'wasted chips']
+NRE_COLUMNS = ['module NRE', 'chip NRE', 'package NRE']
+
+
+class Portfolio():
+    '''
+    Packages with their sale volumes compiled into arrays once, so that cost_RE and the amortized
+    NRE of every package are evaluated for a whole batch of parameter sets in one pass.
+
+    values: model parameters as produced by spec.derive, each one a float or an array of shape
+    (batch...), default the currently loaded spec. Results have shape (batch..., packages, columns)
+    and match Package.cost_RE and utils.system_total_apporitioned_NRE_cost up to rounding.
+    Chip and module NRE follow the parameter set, only setNRE overrides are kept.
+
+    groups: group of every package (default all 0), the NRE of each group is amortized over the
+    volumes of its own packages only, i.e. independent portfolios are evaluated in one pass;
+    Packages may then be a list of (package, volume) pairs, the same package in several groups.
+
+    dtype: float type of the arrays and results. float32 halves the memory and bandwidth of
+    large batches; against the float64 reference, the total cost of a package is then within a
+    relative 2e-6 and every column within 2e-6 of that total (a column may be a small difference
+    of large terms, e.g. defect chips at a yield close to 1, with a larger relative error of its
+    own), as long as every die and interposer fits at least 10 times on a wafer. Dies per wafer
+    close to 0 are ill-conditioned (a difference of two nearly equal terms), keep float64 there.
+    '''
+    def __init__(self, Packages: dict[Package, int], groups: list[int] = None, dtype='float64'):
+        self.dtype = np.dtype(dtype)
+        items = list(Packages.items() if isinstance(Packages, dict) else Packages)
+        self.packages: list[Package] = [p for p, _ in items]
+        self.volume = np.array([v for _, v in items], dtype=self.dtype)
+        self.groups = np.zeros(len(items), dtype=int) if groups is None else np.asarray(
+            groups, dtype=int)
+
+        chips: dict = {}
+        modules: dict = {}
+        for g, p in zip(self.groups.tolist(), self.packages):
+            for c in p.chips:
+                if isinstance(c, Subassembly):
+                    raise ValueError('package {} includes the subassembly {}, hierarchical '
+                                     'packages are evaluated by the object model only'.format(
+                                         p.name, c.name))
+                chips.setdefault((g, c), len(chips))
+                for m in c.modules:
+                    modules.setdefault((g, m), len(modules))
+        self.chips = [c for _, c in chips]
+        self.modules = [m for _, m in modules]
+        self._chip_index = chips  # (group, chip) -> index
+        self._module_index = modules  # (group, module) -> index
+
+        # sparse incidence, entries grouped by package in dict order:
+        # (package, chip, num) for every chip of a package and
+        # (package, module, num2, num) for every module of every chip of a package
+        groups = self.groups.tolist()
+        chip_entries = [(i, chips[(groups[i], c)], num) for i, p in enumerate(self.packages)
+                        for c, num in p.chips.items()]
+        module_entries = [(i, modules[(groups[i], m)], num2, num)
+                          for i, p in enumerate(self.packages) for c, num in p.chips.items()
+                          for m, num2 in c.modules.items()]
+        self.entry_chip = np.array([e[1] for e in chip_entries], dtype=int)
+        self.entry_num = np.array([e[2] for e in chip_entries], dtype=self.dtype)
+        self.entry_start = _segments([e[0] for e in chip_entries], len(self.packages))
+        self.module_entry_module = np.array([e[1] for e in module_entries], dtype=int)
+        self.module_entry_num2 = np.array([e[2] for e in module_entries], dtype=self.dtype)
+        self.module_entry_num = np.array([e[3] for e in module_entries], dtype=self.dtype)
+        self.module_entry_start = _segments([e[0] for e in module_entries], len(self.packages))
+
+        real = [not isinstance(c, dummy) for c in self.chips]
+        self.chip_real = np.array(real, dtype=self.dtype)
+        self.chip_area = np.array([c.area for c in self.chips], dtype=self.dtype)
+        reference = next((c.node for c in self.chips if not isinstance(c, dummy)), '55')
+        self.chip_nodes = [c.node if r else reference for c, r in zip(self.chips, real)]
+        self.chip_known_NRE = np.array([c.knownNRE if r else 0 for c, r in zip(self.chips, real)],
+                                       dtype=self.dtype)
+
+        self.module_nodes = [m.node for m in self.modules]
+        self._node_index: dict = {}  # node list of the technology table -> (chips, modules)
+        self.module_NRE_area = np.array(
+            [20 if isinstance(m, D2D) else m.area for m in self.modules], dtype=self.dtype)
+        self.module_known_NRE = np.array([m.knownNRE for m in self.modules], dtype=self.dtype)
+
+        # scenario independent quantities and volumes of the amortization
+        self.chip_num = self._chip_sum(np.ones(len(self.chips), dtype=self.dtype))
+        self.total_module_area = self._chip_sum(self.chip_area)
+        volume = self.volume.astype(float)
+        module_volume = np.zeros(len(self.modules))
+        chip_volume = np.zeros(len(self.chips))
+        for i, m, num2, num in module_entries:
+            module_volume[m] += num2 * num * volume[i]
+        for i, c, num in chip_entries:
+            chip_volume[c] += num * volume[i]
+        self.module_volume = module_volume.astype(self.dtype)
+        self.chip_volume = chip_volume.astype(self.dtype)
+
+        self.is_OS = np.array([isinstance(p, OS) for p in self.packages])
+        self.chip_last = np.array([getattr(p, 'chip_last', 1) for p in self.packages])
+        advanced = [self._advanced_parameters(p) for p in self.packages]
+        self.advanced_parameters = [_Lookup([a[k] for a in advanced]) for k in range(7)]
+        # packages sharing a design (equal area) share the package NRE
+        keys = [(g, self._area_key(p), a)
+                for g, p, a in zip(groups, self.packages, self.total_module_area)]
+        index: dict = {}
+        group = np.array([index.setdefault(k, len(index)) for k in keys], dtype=int)
+        self.package_volume = (np.bincount(group, weights=volume)[group] if keys else group).astype(
+            self.dtype)
+
+    def subset(self, rows: list[int]) -> 'Portfolio':
+        '''
+        the packages rows compiled alone, their NRE still amortized over the volumes of this
+        portfolio
+        '''
+        part = Portfolio([(self.packages[i], self.volume[i]) for i in rows], self.groups[rows],
+                         self.dtype)
+        part.module_volume = self.module_volume[[self._module_index[k]
+                                                 for k in part._module_index]]
+        part.chip_volume = self.chip_volume[[self._chip_index[k] for k in part._chip_index]]
+        part.package_volume = self.package_volume[rows]
+        return part
+
+    def _technology(self, v: dict, name: str, modules=False) -> np.ndarray:
+        '''
+        (batch..., chips) or (batch..., modules) array of the per-node parameter name, one fancy
+        index into the technology table of v (spec.derive), the node indices are computed once
+        per node list
+        '''
+        nodes = tuple(v['nodes'])
+        if nodes not in self._node_index:
+            self._node_index[nodes] = (spec.index(self.chip_nodes, nodes),
+                                       spec.index(self.module_nodes, nodes))
+        return np.asarray(v['Technology'][name],
+                          dtype=self.dtype)[..., self._node_index[nodes][modules]]
+
+    def _axis(self, x) -> np.ndarray:
+        '''
+        append an axis for chips / packages to a (batch...) parameter
+        '''
+        return np.asarray(x, dtype=self.dtype)[..., None]
+
+    def _chip_sum(self, x) -> np.ndarray:
+        '''
+        (batch..., packages) sum of x[chip] * num over the chips of every package
+        '''
+        return _segment_sum(x[..., self.entry_chip] * self.entry_num, self.entry_start)
+
+    @staticmethod
+    def _advanced_parameters(p: Package) -> tuple:
+        if isinstance(p, OS):
+            return SI.parameter_names  # placeholder, masked out
+        # spec names of the parameters read from the loaded values, constants for the others
+        return p.design_parameters()[:7]
+
+    def _area_key(self, p: Package):
+        if isinstance(p, OS):
+            return 'os_area_scale_factor'
+        return self._advanced_parameters(p)[6]
+
+    def die_yield(self, values: dict = None) -> np.ndarray:
+        '''
+        (batch..., chips) array of the die yield of every chip (1 for dummies)
+        '''
+        v = vars(spec) if values is None else values
+        defect_density = self._technology(v, 'Defect_Density_Die') * self.chip_real
+        return formula.die_yield(self.chip_area, defect_density, self._axis(v['critical_level']))
+
+    def cost_RE(self, values: dict = None) -> np.ndarray:
+        '''
+        (batch..., packages, 5) array of
+        (RE_raw_chips, RE_defect_chips, RE_raw_package, RE_defect_pacakge, RE_wasted_KGD)
+        '''
+        v = vars(spec) if values is None else values
+
+        # chips (batch..., chips)
+        area = self.chip_area
+        wafer_cost = self._technology(v, 'Cost_Wafer_Die')
+        N_total = formula.N_die_total(area, self._axis(v['wafer_diameter']),
+                                      self._axis(v['scribe_lane']), self._axis(v['edge_loss']))
+        die_yield = self.die_yield(v)
+        cost_raw_die = wafer_cost / N_total * self.chip_real
+        cost_defect = (wafer_cost / (N_total * die_yield) - wafer_cost / N_total) * self.chip_real
+
+        # packages (batch..., packages)
+        cost_defect_chips = self._chip_sum(cost_defect)
+        chip_num = self.chip_num
+        os_area_scale_factor = self._axis(v['os_area_scale_factor'])
+        cost_factor_os = self._axis(v['cost_factor_os'])
+        bonding_yield_os = self._axis(v['bonding_yield_os'])
+
+        # organic substrate
+        os_area = self.total_module_area * os_area_scale_factor
+        factor = _layer_factor(os_area, chip_num)
+        os_raw_chips = self._chip_sum(cost_raw_die + area * self._axis(v['c4_bump_cost_factor']))
+        os_raw_package = os_area * cost_factor_os * factor
+        os_loss = 1 / (bonding_yield_os**chip_num) - 1
+        os_defect_package = os_raw_package * os_loss
+        os_wasted_chips = (os_raw_chips + cost_defect_chips) * os_loss
+
+        # advanced packages
+        _, _, wafer, defect, critical, bonding, scale = self._advanced(v)
+        interposer_area = self.total_module_area * scale
+        adv_area = interposer_area * os_area_scale_factor
+        u_bump = self._axis(v['u_bump_cost_factor'])
+        adv_raw_chips = _segment_sum(
+            cost_raw_die[..., self.entry_chip] * self.entry_num +
+            area[self.entry_chip] * u_bump, self.entry_start)
+        N_package = formula.N_die_total(interposer_area, self._axis(v['wafer_diameter']),
+                                        self._axis(v['scribe_lane']), self._axis(v['edge_loss']))
+        cost_interposer = wafer / N_package + interposer_area * self._axis(
+            v['c4_bump_cost_factor'])
+        cost_substrate = adv_area * cost_factor_os
+        y1 = formula.die_yield(interposer_area, defect, critical)
+        y2 = bonding**chip_num
+        y3 = bonding_yield_os
+        chip_last = self.chip_last == 1
+        adv_defect_package = np.where(chip_last, cost_interposer * (1 / (y1 * y2 * y3) - 1),
+                                      cost_interposer * (1 / (y1 * y3) - 1)) \
+            + cost_substrate * (1 / y3 - 1)
+        adv_wasted_chips = (adv_raw_chips + cost_defect_chips) * np.where(
+            chip_last, 1 / (y2 * y3) - 1, 1 / (y1 * y3) - 1)
+
+        is_OS = self.is_OS
+        return np.stack(np.broadcast_arrays(
+            np.where(is_OS, os_raw_chips, adv_raw_chips), cost_defect_chips,
+            np.where(is_OS, os_raw_package, cost_interposer + cost_substrate),
+            np.where(is_OS, os_defect_package, adv_defect_package),
+            np.where(is_OS, os_wasted_chips, adv_wasted_chips)),
+                        axis=-1)
+
+    def NRE(self, values: dict = None) -> np.ndarray:
+        '''
+        (batch..., packages, 3) array of amortized (module_NRE, chip_NRE, package_NRE) per unit
+        '''
+        v = vars(spec) if values is None else values
+
+        module_NRE = np.where(
+            self.module_known_NRE != 0, self.module_known_NRE,
+            self._technology(v, 'Module_NRE_Cost_Factor', True) * self.module_NRE_area)
+        chip_NRE = np.where(
+            self.chip_known_NRE != 0, self.chip_known_NRE,
+            self.chip_area * self._technology(v, 'Chip_NRE_Cost_Factor') +
+            self._technology(v, 'Chip_NRE_Cost_Fixed')) * self.chip_real
+        module_unit = module_NRE / self.module_volume
+        chip_unit = chip_NRE / self.chip_volume
+
+        os_area = self.total_module_area * self._axis(v['os_area_scale_factor'])
+        os_NRE = os_area * self._axis(v['os_NRE_cost_factor']) * _layer_factor(
+            os_area, self.chip_num) + self._axis(v['os_NRE_cost_fixed'])
+        NRE_factor, NRE_fixed, _, _, _, _, scale = self._advanced(v)
+        interposer_area = self.total_module_area * scale
+        adv_NRE = interposer_area * NRE_factor + NRE_fixed + interposer_area * self._axis(
+            v['os_area_scale_factor']) * self._axis(v['cost_factor_os'])
+        package_NRE = np.where(self.is_OS, os_NRE, adv_NRE)
+
+        return np.stack(np.broadcast_arrays(
+            _segment_sum(
+                module_unit[..., self.module_entry_module] * self.module_entry_num2 *
+                self.module_entry_num, self.module_entry_start), self._chip_sum(chip_unit),
+            package_NRE / self.package_volume),
+                        axis=-1)
+
+    def cost(self, values: dict = None) -> np.ndarray:
+        '''
+        (batch..., packages, 8) array of cost_RE followed by the amortized NRE
+        '''
+        RE = self.cost_RE(values)
+        NRE = self.NRE(values)
+        shape = np.broadcast_shapes(RE.shape[:-1], NRE.shape[:-1])
+        return np.concatenate([
+            np.broadcast_to(RE, shape + RE.shape[-1:]),
+            np.broadcast_to(NRE, shape + NRE.shape[-1:])
+        ], axis=-1)
+
+    def total(self, values: dict = None) -> np.ndarray:
+        '''
+        (batch..., packages) array of the total unit cost (RE and amortized NRE)
+        '''
+        return self.cost(values).sum(axis=-1)
+
+    def _advanced(self, v: dict) -> list:
+        return [lookup.take(v, self.dtype) for lookup in self.advanced_parameters]
+
+
+class _Lookup():
+    '''
+    per-element keys (parameter names or constants) stored as unique keys and an index,
+    so that a table is looked up once per unique key
+    '''
+    def __init__(self, keys: list):
+        unique: dict = {}
+        self.index = np.array([unique.setdefault(k, len(unique)) for k in keys], dtype=int)
+        self.keys = list(unique)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def take(self, table: dict, dtype=float) -> np.ndarray:
+        '''
+        (batch..., elements) array of table[key] of every element
+        '''
+        return _gather(table, self.keys, dtype)[..., self.index]
+
+
+def _segments(owner: list, n: int) -> tuple:
+    '''
+    (start of each of the n segments, empty segments) of entries sorted by owner
+    '''
+    owner = np.asarray(owner, dtype=int)
+    start = np.searchsorted(owner, np.arange(n))
+    return start, np.bincount(owner, minlength=n) == 0
+
+
+def _segment_sum(x, segments: tuple) -> np.ndarray:
+    '''
+    (batch..., segments) sums of the (batch..., entries) array x, accumulated in entry order
+    '''
+    start, empty = segments
+    x = np.concatenate([x, np.zeros(x.shape[:-1] + (1, ), dtype=x.dtype)], axis=-1)
+    return np.where(empty, 0, np.add.reduceat(x, start, axis=-1))
+
+
+def _gather(table: dict, keys: list, dtype=float) -> np.ndarray:
+    '''
+    (batch..., len(keys)) array of table[key], a key that is not a str is used as a constant
+    '''
+    columns = [np.asarray(table[k] if isinstance(k, str) else k, dtype=dtype) for k in keys]
+    if not columns:
+        return np.zeros(0, dtype=dtype)
+    return np.stack(np.broadcast_arrays(*columns), axis=-1)
+
+
+def _layer_factor(area, chip_num):
+    '''
+    substrate layer factor of organic substrate packages, see OS.NRE
+    '''
+    factor = np.where(chip_num == 1, 1, np.where(area > 30 * 30, 2, np.where(area > 17 * 17, 1.75,
+                                                                              1.5)))
+    return factor.astype(area.dtype)
@@ -0,0 +1,95 @@
+from chiplet_actuary import cache
+import chiplet_actuary.spec as spec
+from configparser import ConfigParser
+import configparser
+import threading
+import os
+
+
+def sections(param: ConfigParser) -> dict[str, dict]:
+    '''
+    raw options of every section of a parameter set
+    '''
+    return {section: dict(param.items(section, raw=True)) for section in param.sections()}
+
+
+def changed_sections(old: ConfigParser, new: ConfigParser) -> set[str]:
+    '''
+    sections added, removed or with any option changed between two parameter sets
+    '''
+    old, new = sections(old), sections(new)
+    return {s for s in old.keys() | new.keys() if old.get(s) != new.get(s)}
+
+
+class Watcher():
+    '''
+    Reload parameter.ini when it changes, polling its stat (mtime, size, inode) every interval
+    seconds in a daemon thread (start) or on demand (poll).
+
+    A reload reads and derives the whole new parameter set first, then swaps it in under lock and
+    invalidates only the cached values (see cache) depending on the sections that changed. A file
+    that does not parse or misses options (e.g. caught in the middle of a write) is ignored until
+    the next poll. Hold lock while evaluating to never see a reload in the middle. Existing
+    modules, chips and packages read the reloaded parameters, only the values set explicitly
+    (setNRE, setFactor, parameters given to Advanced) are kept.
+    '''
+    def __init__(self, path=spec.parameter_path, interval=1.0, on_reload=None):
+        self.path = path
+        self.interval = interval
+        self.on_reload = on_reload  # called with the changed sections after every reload
+        self.lock = threading.RLock()
+        self.stamp = self._stamp()
+        self.error: Exception = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def poll(self) -> set[str]:
+        '''
+        reload the parameters if the file changed since the last reload, return the changed
+        sections
+        '''
+        stamp = self._stamp()
+        if stamp is None or stamp == self.stamp:
+            return set()
+        try:
+            param = spec.read(self.path)
+            values = spec.derive(param.getfloat, spec.node_sections(param))
+        except (configparser.Error, ValueError) as e:
+            self.error = e
+            return set()
+        self.stamp = stamp
+        self.error = None
+        changed = changed_sections(spec.param, param)
+        if changed:
+            with self.lock:
+                generation = spec.generation
+                spec.param = param
+                spec.apply(values)
+                cache.invalidate(changed, generation)
+            if self.on_reload is not None:
+                self.on_reload(changed)
+        return changed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='parameter watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1 @@
+# makes the repository root importable (chiplet_actuary, exploration) when running pytest
@@ -1,78 +1,62 @@
 from typing import Tuple
 import math
+import numpy as np
 import pandas as pd
 from chiplet_actuary import module
 from chiplet_actuary import chip
 from chiplet_actuary import package
 from chiplet_actuary import utils
 from chiplet_actuary import spec
+from chiplet_actuary import sweep
+from chiplet_actuary import vector
+from chiplet_actuary import formula
 
 
-def yield_area() -> pd.DataFrame:
+def technologies() -> tuple[list[str], np.ndarray, np.ndarray]:
     '''
-    Yield-Area relation under different technology
+    (column names, defect densities, critical levels) of every node, the RDL and the silicon
+    interposer
     '''
-    def square(x):
-        return x**2
+    columns = ['{:.2f}({}nm)'.format(spec.Defect_Density_Die[i], i)
+               for i in spec.nodes] + ['RDL', 'SI']
+    defect_density = np.append(spec.Technology['Defect_Density_Die'],
+                               [spec.defect_density_rdl, spec.defect_density_si])
+    critical_level = np.array([spec.critical_level] * len(spec.nodes) +
+                              [spec.critical_level_rdl, spec.critical_level_si])
+    return columns, defect_density, critical_level
 
-    def die_yield(area, defect_density, critical_level):
-        return (1 + defect_density / 100 * area / critical_level)**(-critical_level)
-
-    Areas = list(map(square, range(1, 31)))
-
-    yield_sheet = pd.DataFrame({'Area': Areas})
-
-    for i in spec.__nodes:
-        y = list(
-            map(die_yield, Areas, [spec.Defect_Density_Die[i]] * len(Areas),
-                [spec.critical_level] * len(Areas)))
-        yield_sheet['{:.2f}({}nm)'.format(spec.Defect_Density_Die[i], i)] = y
-
-    y = list(
-        map(die_yield, Areas, [spec.defect_density_rdl] * len(Areas),
-            [spec.critical_level_rdl] * len(Areas)))
-    yield_sheet['RDL'] = y
-    y = list(
-        map(die_yield, Areas, [spec.defect_density_si] * len(Areas),
-            [spec.critical_level_si] * len(Areas)))
-    yield_sheet['SI'] = y
 
+def yield_area(areas=None) -> pd.DataFrame:
+    '''
+    Yield-Area relation under different technology, areas in mm2 (default 1, 4, ..., 900),
+    e.g. np.arange(1, 8581) / 10 for 0.1 mm2 steps up to the reticle size;
+    the whole (areas x technologies) grid is evaluated in one broadcast
+    '''
+    if areas is None:
+        areas = np.arange(1, 31)**2
+    areas = np.asarray(areas)
+    columns, defect_density, critical_level = technologies()
+    y = formula.die_yield(areas[:, None], defect_density, critical_level)
+
+    yield_sheet = pd.DataFrame(y, columns=columns)
+    yield_sheet.insert(0, 'Area', areas)
     return yield_sheet.round(3)
 
 
-def cost_per_area() -> pd.DataFrame:
+def cost_per_area(areas=None) -> pd.DataFrame:
     '''
-    cost per area under different technology
+    cost per area under different technology, areas as in yield_area
     '''
-    def square(x):
-        return x**2
-
-    def cost_per_area(area, defect_density, critical_level):
-        die_yield = (1 + defect_density / 100 * area / critical_level)**(-critical_level)
-        Area_chip = area + 2 * spec.scribe_lane * math.sqrt(area) + spec.scribe_lane**2
-        N_total = math.pi * (spec.wafer_diameter / 2 - spec.edge_loss)**2 / Area_chip - math.pi * (
-            spec.wafer_diameter - 2 * spec.edge_loss) / math.sqrt(2 * Area_chip)
-        return math.pi * (spec.wafer_diameter / 2)**2 / (N_total * area) / die_yield
-
-    Areas = list(map(square, range(1, 31)))
-
-    cost_sheet = pd.DataFrame({'Area': Areas})
-
-    for i in spec.__nodes:
-        c = list(
-            map(cost_per_area, Areas, [spec.Defect_Density_Die[i]] * len(Areas),
-                [spec.critical_level] * len(Areas)))
-        cost_sheet['{:.2f}({}nm)'.format(spec.Defect_Density_Die[i], i)] = c
-
-    c = list(
-        map(cost_per_area, Areas, [spec.defect_density_rdl] * len(Areas),
-            [spec.critical_level_rdl] * len(Areas)))
-    cost_sheet['RDL'] = c
-    c = list(
-        map(cost_per_area, Areas, [spec.defect_density_si] * len(Areas),
-            [spec.critical_level_si] * len(Areas)))
-    cost_sheet['SI'] = c
-
+    if areas is None:
+        areas = np.arange(1, 31)**2
+    areas = np.asarray(areas)
+    columns, defect_density, critical_level = technologies()
+    die_yield = formula.die_yield(areas[:, None], defect_density, critical_level)
+    N_total = formula.N_die_total(areas, spec.wafer_diameter, spec.scribe_lane, spec.edge_loss)
+    c = math.pi * (spec.wafer_diameter / 2)**2 / (N_total * areas)[:, None] / die_yield
+
+    cost_sheet = pd.DataFrame(c, columns=columns)
+    cost_sheet.insert(0, 'Area', areas)
     return cost_sheet.round(3)
 
 
@@ -290,21 +274,18 @@ def single_chiplet_multiple_systems(volume: int) -> pd.DataFrame:
     mcm_reuse_NRE = utils.system_total_apporitioned_NRE_cost(dict(zip(mcm_reuses, volumes)))
     si_NRE = utils.system_total_apporitioned_NRE_cost(dict(zip(sis, volumes)))
     si_reuse_NRE = utils.system_total_apporitioned_NRE_cost(dict(zip(si_reuses, volumes)))
+    # reuse4 is the design of integration4, evaluated once
+    RE = utils.designs_cost_RE(socs + mcms + mcm_reuses + sis + si_reuses)
+
+    def costs(p, NRE):
+        return RE[p][0:2] + (sum(RE[p][2:5]), ) + NRE[p]
 
     cost = []
     for i in range(len(socs)):
-        soc = socs[i]
-        mcm = mcms[i]
-        mcm_reuse = mcm_reuses[i]
-        si = sis[i]
-        si_reuse = si_reuses[i]
-
-        cost.append(soc.cost_RE()[0:2] + (soc.cost_package(), ) + soc_NRE[soc] +
-                    mcm.cost_RE()[0:2] + (mcm.cost_package(), ) + mcm_NRE[mcm] +
-                    mcm_reuse.cost_RE()[0:2] + (mcm_reuse.cost_package(), ) +
-                    mcm_reuse_NRE[mcm_reuse] + si.cost_RE()[0:2] + (si.cost_package(), ) +
-                    si_NRE[si] + si_reuse.cost_RE()[0:2] + (si_reuse.cost_package(), ) +
-                    si_reuse_NRE[si_reuse])
+        cost.append(
+            costs(socs[i], soc_NRE) + costs(mcms[i], mcm_NRE) +
+            costs(mcm_reuses[i], mcm_reuse_NRE) + costs(sis[i], si_NRE) +
+            costs(si_reuses[i], si_reuse_NRE))
 
     sum_mcm = sum(cost[2][6:9])
 
@@ -362,6 +343,8 @@ def one_center_multiple_extensions(volume: int) -> pd.DataFrame:
     mcm_NRE = utils.system_total_apporitioned_NRE_cost(dict(zip(mcms, volumes)))
     reuse_NRE = utils.system_total_apporitioned_NRE_cost(dict(zip(reuses, volumes)))
     reuse_hete_NRE = utils.system_total_apporitioned_NRE_cost(dict(zip(reuse_hetes, volumes)))
+    # reuse4 is the design of integration4, evaluated once
+    RE = utils.designs_cost_RE(socs + mcms + reuses + reuse_hetes)
 
     cost = []
     for i in range(len(socs)):
@@ -370,11 +353,10 @@ def one_center_multiple_extensions(volume: int) -> pd.DataFrame:
         reuse = reuses[i]
         reuse_hete = reuse_hetes[i]
 
-        cost.append(soc.cost_RE()[0:2] + (soc.cost_package(), ) + soc_NRE[soc] +
-                    mcm.cost_RE()[0:2] + (mcm.cost_package(), ) + mcm_NRE[mcm] +
-                    reuse.cost_RE()[0:2] + (reuse.cost_package(), ) + reuse_NRE[reuse] +
-                    reuse_hete.cost_RE()[0:2] + (reuse.cost_package(), ) +
-                    reuse_hete_NRE[reuse_hete])
+        cost.append(RE[soc][0:2] + (sum(RE[soc][2:5]), ) + soc_NRE[soc] + RE[mcm][0:2] +
+                    (sum(RE[mcm][2:5]), ) + mcm_NRE[mcm] + RE[reuse][0:2] +
+                    (sum(RE[reuse][2:5]), ) + reuse_NRE[reuse] + RE[reuse_hete][0:2] +
+                    (sum(RE[reuse][2:5]), ) + reuse_hete_NRE[reuse_hete])
 
     sum_mcm = sum(cost[3][6:9])
 
@@ -428,32 +410,20 @@ def a_few_sockets_multiple_collocations(volume: int) -> pd.DataFrame:
     k = [2, 2, 3, 4, 4]
     n = [2, 4, 4, 4, 6]
 
+    # every design of the (k, n) collocations is evaluated once
+    SoCs = [SoC_2, SoC_2, SoC_3, SoC_4, SoC_4]
+    OSs = [p_OS_2, p_OS_2, p_OS_3, p_OS_4, p_OS_4]
+    SIs = [p_SI_2, p_SI_2, p_SI_3, p_SI_4, p_SI_4]
+    RE = utils.designs_cost_RE(SoCs + OSs + SIs)
+
     soc_NRE = [soc_2.NRE(), soc_2.NRE(), soc_3.NRE(), soc_4.NRE(), soc_4.NRE()]
-    SoC_RE = [
-        SoC_2.cost_total_system(),
-        SoC_2.cost_total_system(),
-        SoC_3.cost_total_system(),
-        SoC_4.cost_total_system(),
-        SoC_4.cost_total_system()
-    ]
+    SoC_RE = [sum(RE[p]) for p in SoCs]
     SoC_NRE = [SoC_2.NRE(), SoC_2.NRE(), SoC_3.NRE(), SoC_4.NRE(), SoC_4.NRE()]
 
-    OS_RE = [
-        p_OS_2.cost_total_system(),
-        p_OS_2.cost_total_system(),
-        p_OS_3.cost_total_system(),
-        p_OS_4.cost_total_system(),
-        p_OS_4.cost_total_system()
-    ]
+    OS_RE = [sum(RE[p]) for p in OSs]
     OS_NRE = [p_OS_2.NRE(), p_OS_2.NRE(), p_OS_3.NRE(), p_OS_4.NRE(), p_OS_4.NRE()]
 
-    SI_RE = [
-        p_SI_2.cost_total_system(),
-        p_SI_2.cost_total_system(),
-        p_SI_3.cost_total_system(),
-        p_SI_4.cost_total_system(),
-        p_SI_4.cost_total_system()
-    ]
+    SI_RE = [sum(RE[p][0:2]) + sum(RE[p][2:5]) for p in SIs]
     SI_NRE = [p_SI_2.NRE(), p_SI_2.NRE(), p_SI_3.NRE(), p_SI_4.NRE(), p_SI_4.NRE()]
 
     cost = []
@@ -479,3 +449,81 @@ def a_few_sockets_multiple_collocations(volume: int) -> pd.DataFrame:
             'SI package NRE'
         ]).div(sum_mcm))
     return cost_sheet
+
+
+def multiple_chiplets_system(area: float,
+                             node: str,
+                             num_chip: int,
+                             packaging: str,
+                             volume: int,
+                             bandwidth: float = None,
+                             pin_rate: float = 16,
+                             bump_pitch: float = 0.055) -> tuple:
+    '''
+    RE and amortized NRE cost of a system of num_chip identical chiplets (SoC if num_chip is 1),
+    the D2D area is 10% of the module area unless sized from bandwidth (Gb/s) by utils.D2D_areas;
+    cost_RE is reused from the previous point if the design is equivalent (utils.design_cost_RE),
+    e.g. for the points of a sweep that only differ by volume
+    '''
+    m = module.Module('module', node, area / num_chip)
+    if num_chip == 1:
+        system = package.SoC('soc', node, {m: 1}, packaging)
+    else:
+        if bandwidth is None:
+            c = chip.Chiplet(m, m.area * 0.1)
+        else:
+            c = utils.chiplets([m], bandwidth, pin_rate, bump_pitch)[0]
+        if packaging == 'OS':
+            system = package.OS('integration', {c: num_chip})
+        elif packaging == 'FO':
+            system = package.FO('integration', {c: num_chip}, chip_last=1)
+        elif packaging == 'SI':
+            system = package.SI('integration', {c: num_chip})
+    NRE = utils.system_total_apporitioned_NRE_cost({system: volume})
+    return utils.design_cost_RE(system) + NRE[system]
+
+
+def design_space_sweep(areas, nodes, chip_nums, packagings, volumes, chunk_size=64) -> sweep.Sweep:
+    return sweep.Sweep(
+        {
+            'area': list(areas),
+            'node': list(nodes),
+            'num_chip': list(chip_nums),
+            'packaging': list(packagings),
+            'volume': list(volumes)
+        }, chunk_size)
+
+
+def design_space(areas=range(100, 1000, 100),
+                 nodes=('5', '7', '14'),
+                 chip_nums=(1, 2, 4, 8),
+                 packagings=('OS', 'FO', 'SI'),
+                 volumes=(500000, 2000000, 10000000),
+                 checkpoint: str = None,
+                 jobs=1) -> pd.DataFrame:
+    '''
+    cost breakdown over a grid of area, node, chip number, packaging and volume,
+    resumable from checkpoint
+    '''
+    s = design_space_sweep(areas, nodes, chip_nums, packagings, volumes)
+    rows = sweep.run(s, multiple_chiplets_system, checkpoint, jobs)
+    return pd.DataFrame.from_records(rows,
+                                     columns=list(s.axes) + vector.RE_COLUMNS + vector.NRE_COLUMNS)
+
+
+def cheapest_designs(k=100,
+                     areas=range(100, 1000, 100),
+                     nodes=('5', '7', '14'),
+                     chip_nums=(1, 2, 4, 8),
+                     packagings=('OS', 'FO', 'SI'),
+                     volumes=(500000, 2000000, 10000000),
+                     column: int = None,
+                     jobs=1) -> pd.DataFrame:
+    '''
+    the k cheapest designs of the grid by total cost, or by one cost column (0-7 as in
+    design_space), keeping only k rows in memory
+    '''
+    s = design_space_sweep(areas, nodes, chip_nums, packagings, volumes)
+    rows = sweep.top_k(s, multiple_chiplets_system, k, column, jobs)
+    return pd.DataFrame.from_records(rows,
+                                     columns=list(s.axes) + vector.RE_COLUMNS + vector.NRE_COLUMNS)
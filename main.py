@@ -1,7 +1,113 @@
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+import tomllib
+import pandas as pd
 import exploration as ex
+from chiplet_actuary import cache
+from chiplet_actuary import service
+from chiplet_actuary import spec
+from chiplet_actuary import sweep
+from chiplet_actuary import utils
+from chiplet_actuary.vector import RE_COLUMNS, NRE_COLUMNS
 
-y1 = ex.yield_area()
-y2 = ex.single_chiplet_multiple_systems(5000)
 
-print(y1)
-print(y2)
+def read(path: str) -> dict:
+    '''
+    read a scenario file (toml, or json by extension):
+    parameters = "parameter.ini"  (optional, relative to the scenario file)
+    modules, chips, packages      (optional, as in service.build, with their volumes)
+    [[studies]]                   name, study, args, output (csv or parquet, default printed)
+    study is an exploration function (args are its keyword arguments), "portfolio" (cost of the
+    packages of the file) or "sweep" (axes, evaluate, columns, chunk_size as in sweep.build,
+    columns default to the cost_RE and NRE parts)
+    '''
+    with open(path, 'rb') as f:
+        return json.load(f) if path.endswith('.json') else tomllib.load(f)
+
+
+def portfolio(Packages: dict) -> pd.DataFrame:
+    '''
+    cost_RE and amortized NRE of every package
+    '''
+    NRE = utils.system_total_apporitioned_NRE_cost(Packages)
+    rows = [[p.name, volume] + list(p.cost_RE()) + list(NRE[p]) for p, volume in Packages.items()]
+    return pd.DataFrame.from_records(rows,
+                                     columns=['package', 'volume'] + RE_COLUMNS + NRE_COLUMNS)
+
+
+def study(description: dict, Packages: dict, jobs=1) -> pd.DataFrame:
+    kind = description['study']
+    if kind == 'portfolio':
+        return portfolio(Packages)
+    if kind == 'sweep':
+        s, evaluate, columns = sweep.build(dict({'columns': RE_COLUMNS + NRE_COLUMNS},
+                                                **description))
+        table = pd.DataFrame.from_records(sweep.run(s, evaluate, description.get('checkpoint'),
+                                                    jobs))
+        if len(columns) > table.shape[1] or ('columns' not in description
+                                             and len(columns) != table.shape[1]):
+            raise ValueError('{} returns {} results per point, give the sweep its columns'.format(
+                description['evaluate'], table.shape[1] - len(s.axes)))
+        table.columns = columns + list(table.columns[len(columns):])
+        return table
+    function = getattr(ex, kind)
+    args = dict(description.get('args', {}))
+    if 'jobs' in inspect.signature(function).parameters:
+        args.setdefault('jobs', jobs)
+    result = function(**args)
+    return result if isinstance(result, pd.DataFrame) else pd.DataFrame([list(result)])
+
+
+def write(table: pd.DataFrame, path: str):
+    if path.endswith('.parquet'):
+        try:
+            table.to_parquet(path)
+        except ImportError:
+            sys.exit('error: parquet output needs pyarrow or fastparquet')
+    else:
+        table.to_csv(path, index=not isinstance(table.index, pd.RangeIndex))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run the studies of a scenario file')
+    parser.add_argument('scenario', nargs='?', default='scenario.toml',
+                        help='scenario file (toml or json, default scenario.toml)')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes of the sweeps')
+    parser.add_argument('--out-dir', default='.', help='directory of the study outputs')
+    parser.add_argument('--study', action='append', help='run only this study (repeatable)')
+    args = parser.parse_args(argv)
+
+    scenario = read(args.scenario)
+    if 'parameters' in scenario:
+        spec.load(os.path.join(os.path.dirname(args.scenario), scenario['parameters']))
+    # the model objects are built once, the cache is shared within a study and cleared after it
+    cache.enabled = True
+    Packages = dict(service.build(scenario)) if 'packages' in scenario else {}
+
+    for description in scenario.get('studies', []):
+        name = description.get('name', description['study'])
+        if args.study and name not in args.study:
+            continue
+        start = time.perf_counter()
+        try:
+            table = study(description, Packages, args.jobs)
+        except ValueError as e:
+            sys.exit('error: {}: {}'.format(name, e))
+        finally:
+            cache.clear()
+        seconds = time.perf_counter() - start
+        if 'output' in description:
+            path = os.path.join(args.out_dir, description['output'])
+            write(table, path)
+            print('{}: {:.3f} s -> {}'.format(name, seconds, path), file=sys.stderr)
+        else:
+            print(table)
+            print('{}: {:.3f} s'.format(name, seconds), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
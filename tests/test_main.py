@@ -0,0 +1,42 @@
+import json
+import pandas as pd
+import pytest
+import main
+from chiplet_actuary import cache
+from chiplet_actuary.vector import RE_COLUMNS, NRE_COLUMNS
+
+AXES = {'area': [100, 400], 'node': ['7'], 'num_chip': [1, 2], 'packaging': ['OS'],
+        'volume': [500000]}
+
+
+def total(**point):
+    return [1.0]
+
+
+@pytest.fixture(autouse=True)
+def restore_cache(monkeypatch):
+    # main enables the cache for the whole process
+    monkeypatch.setattr(cache, 'enabled', cache.enabled)
+
+
+def scenario(tmp_path, **study):
+    path = tmp_path / 'scenario.json'
+    path.write_text(json.dumps({'studies': [dict(name='sweep', study='sweep', **study)]}))
+    return str(path)
+
+
+def test_sweep_default_columns(tmp_path):
+    path = scenario(tmp_path, evaluate='exploration:multiple_chiplets_system', axes=AXES,
+                    output='sweep.csv')
+    main.main([path, '--out-dir', str(tmp_path)])
+    table = pd.read_csv(tmp_path / 'sweep.csv')
+    assert list(table.columns) == list(AXES) + RE_COLUMNS + NRE_COLUMNS
+    assert len(table) == 4
+    assert cache.size() == 0
+
+
+def test_sweep_without_columns_rejected(tmp_path):
+    path = scenario(tmp_path, evaluate='test_main:total', axes=AXES)
+    with pytest.raises(SystemExit) as e:
+        main.main([path])
+    assert 'columns' in str(e.value.code)
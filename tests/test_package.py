@@ -0,0 +1,12 @@
+import pytest
+from chiplet_actuary import chip, module, package
+
+
+def test_advanced_parameters_read_only():
+    c = chip.Chiplet(module.Module('m', '7', 200), 20)
+    p = package.SI('si', {c: 4})
+    fingerprint = p.fingerprint
+    for name in ('wafer_cost', 'bonding_yield', 'chip_last'):
+        with pytest.raises(AttributeError):
+            setattr(p, name, 1)
+    assert p.fingerprint == fingerprint
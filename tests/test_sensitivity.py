@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from chiplet_actuary import sensitivity, module, package
+
+
+def ishigami(X, a=7, b=0.1):
+    return np.sin(X[:, 0]) + a * np.sin(X[:, 1])**2 + b * X[:, 2]**4 * np.sin(X[:, 0])
+
+
+def test_indices_ishigami():
+    n = 8192
+    X = sensitivity.saltelli([-np.pi] * 3, [np.pi] * 3, n, seed=0)
+    S1, ST = sensitivity.indices(ishigami(X), n)
+    assert S1 == pytest.approx([0.3139, 0.4424, 0], abs=0.03)
+    assert ST == pytest.approx([0.5576, 0.4424, 0.2437], abs=0.03)
+    assert (S1 >= -0.02).all() and (S1 <= ST + 0.02).all() and (ST <= 1.02).all()
+
+
+def test_indices_offset():
+    # a large constant offset, as the costs carry, must not bias the indices
+    n = 4096
+    X = sensitivity.saltelli([0, 0], [1, 1], n, seed=1)
+    S1, ST = sensitivity.indices(5000 + 30 * X[:, 0] + 60 * X[:, 1] + 5 * X[:, 0] * X[:, 1], n)
+    # main effects 32.5 x1 and 62.5 x2, interaction 5 (x1 - 0.5) (x2 - 0.5)
+    var = np.array([32.5**2, 62.5**2]) / 12
+    total = var.sum() + 25 / 144
+    assert S1 == pytest.approx(var / total, abs=0.01)
+    assert ST == pytest.approx((var + 25 / 144) / total, abs=0.01)
+
+
+def test_sobol_bounds():
+    m = module.Module('m', '7', 300)
+    Packages = {package.SoC('soc', '7', {m: 1}): 500000, package.SoC('si', '7', {m: 1}, 'SI'): 1e5}
+    S1, ST = sensitivity.sobol(Packages, sensitivity.bounds(0.2), n=2048, seed=1)
+    assert S1.shape == ST.shape == (len(sensitivity.bounds(0.2)), 2)
+    assert (S1 >= -0.02).all() and (S1 <= ST + 0.02).all() and (ST <= 1.02).all()
+
+
+def test_gradient_finite_differences():
+    from chiplet_actuary import chip, spec
+    m = module.Module('m', '7', 200)
+    p = package.SI('si', {chip.Chiplet(m, 20): 4})
+    parameters = [('7', 'wafer_cost'), ('7', 'defect_density'), ('SI', 'bonding_yield'),
+                  ('Manufacture', 'scribe_lane')]
+    cost, grad = sensitivity.gradient(lambda: sum(p.cost_RE()), parameters)
+    assert cost == pytest.approx(sum(p.cost_RE()))
+    for key in parameters:
+        x = spec.param.getfloat(*key)
+        h = abs(x) * 1e-6
+        costs = []
+        for value in (x + h, x - h):
+            previous = spec.apply(spec.substitute({key: value}))
+            try:
+                costs.append(sum(p.cost_RE()))
+            finally:
+                spec.apply(previous)
+        assert grad[(key[0], key[1].lower())] == pytest.approx((costs[0] - costs[1]) / (2 * h),
+                                                               rel=1e-5)
@@ -0,0 +1,32 @@
+import copy
+import pytest
+from chiplet_actuary import service
+
+
+def test_build_rejects_invalid():
+    for path, value in ((('modules', 'cpu', 'node'), '6'), (('modules', 'cpu', 'area'), -200),
+                        (('chips', 'soc', 'modules', 'cpu'), -2),
+                        (('packages', 'mcm', 'chips', 'io_chiplet'), 0),
+                        (('packages', 'mcm', 'volume'), 0)):
+        description = copy.deepcopy(service.EXAMPLE)
+        target = description
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = value
+        with pytest.raises(ValueError):
+            service.build(description)
+
+
+def test_batch_isolates_errors(monkeypatch):
+    evaluate = service.evaluate
+
+    def failing(descriptions):
+        if any('fail' in d for d in descriptions):
+            raise RuntimeError('failed')
+        return evaluate(descriptions)
+
+    monkeypatch.setattr(service, 'evaluate', failing)
+    results = service.Service()._evaluate([service.EXAMPLE, {'fail': 1}, {'packages': {'x': {}}}])
+    assert set(results[0]['packages']) == set(service.EXAMPLE['packages'])
+    assert isinstance(results[1], RuntimeError)
+    assert isinstance(results[2], ValueError)
@@ -0,0 +1,14 @@
+import pytest
+from chiplet_actuary import sweep
+
+
+@pytest.mark.parametrize('value', ['3/3', '-1/2', 'x', '1', '1/2/3', '0/0'])
+def test_main_rejects_invalid_shard(value, capsys):
+    with pytest.raises(SystemExit) as e:
+        sweep.main(['run', 'sweep.json', '--shard', value, '--out', 'shard.jsonl'])
+    assert e.value.code == 2
+    assert 'shard' in capsys.readouterr().err
+
+
+def test_shard():
+    assert sweep._shard('2/4') == (2, 4)
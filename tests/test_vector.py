@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from chiplet_actuary import module, chip, package, spec, utils, vector
+
+
+def portfolio():
+    m = module.Module('module', '7', 200)
+    io = chip.Chip('io', '14', {module.Module('io', '14', 300): 1, module.D2D('d2d', '14'): 8})
+    c = chip.Chiplet(m, m.area * 0.1)
+    return {
+        package.OS('os1', {c: 1}): 5000,
+        package.OS('os2', {c: 2, io: 1}): 3000,
+        package.SI('si', {c: 4}): 5000,
+        package.FO('fo_first', {c: 3, chip.dummy(50): 1}, chip_last=0): 1000,
+        package.FO('fo_last', {c: 3, chip.dummy(50): 1}): 1000,
+        package.SoC('soc', '5', {m: 3}): 10000,
+    }
+
+
+def reference(Packages):
+    NRE = utils.system_total_apporitioned_NRE_cost(Packages)
+    return np.array([list(p.cost_RE()) + list(NRE[p]) for p in Packages])
+
+
+def test_portfolio_matches_objects():
+    Packages = portfolio()
+    assert vector.Portfolio(Packages).cost() == pytest.approx(reference(Packages), rel=1e-9)
+
+
+def test_portfolio_batch_matches_objects():
+    Packages = portfolio()
+    wafer_cost, bonding_yield = np.array([9346., 12000.]), np.array([0.95, 0.9])
+    values = {('7', 'wafer_cost'): wafer_cost, ('SI', 'bonding_yield'): bonding_yield}
+    cost = vector.Portfolio(Packages).cost(spec.substitute(values))
+    assert cost.shape[0] == 2
+    for i in range(2):
+        overrides = {('7', 'wafer_cost'): wafer_cost[i], ('SI', 'bonding_yield'): bonding_yield[i]}
+        previous = spec.apply(spec.substitute(overrides))
+        try:
+            assert cost[i] == pytest.approx(reference(Packages), rel=1e-9)
+        finally:
+            spec.apply(previous)